@@ -0,0 +1,92 @@
+"""Per-row CPU cost of list responses: ORM objects through FastAPI's response_model path vs the FastJSON path.
+
+    python benchmarks/serialization.py [rows]
+"""
+import asyncio
+import os
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DATABASE_URL', 'sqlite+aiosqlite://')
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+from fast_house_kg.api import serialization
+from fast_house_kg.api.serialization import FastJSON, schema_columns
+from fast_house_kg.database.db import Base
+from fast_house_kg.database.models import (City, District, UserProfile, Property, PropertyChoices, RegionChoices,
+                                           ConditionChoices)
+from fast_house_kg.database.schema import PageSchema, PropertyOutSchema
+
+COLUMNS = schema_columns(Property, PropertyOutSchema)
+
+def setup(rows: int):
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add_all([City(city_name='Bishkek'), District(district_name='Center'),
+                    UserProfile(username='seller', email='s@example.com', password='x')])
+        db.flush()
+        db.execute(insert(Property), [{
+            'title': f'Flat {i}', 'description': 'Two-room flat near the park, renovated kitchen.',
+            'property_type': PropertyChoices.apartment, 'region': RegionChoices.bishkek, 'city_id': 1,
+            'district_id': 1, 'address': 'Chui avenue', 'area': 40 + i % 80, 'price': 40000 + i, 'rooms': 1 + i % 4,
+            'floor': 1 + i % 9, 'total_floors': 9, 'condition': ConditionChoices.good, 'images': '', 'documents': '',
+            'seller_id': 1, 'created_date': date(2026, 1, 1),
+        } for i in range(rows)])
+        db.commit()
+    return engine
+
+def timed(label: str, rows: int, repeat: int, fn):
+    best = min(_run(fn) for _ in range(repeat))
+    print(f'{label:<34} {best * 1e6 / rows:8.2f} us/row')
+    return best
+
+def _run(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeat = 5
+    engine = setup(rows)
+    field = create_model_field(name='Response', type_=PageSchema[PropertyOutSchema], mode='serialization')
+    page_json = FastJSON(PageSchema[PropertyOutSchema])
+
+    def orm_load():
+        with Session(engine) as db:
+            return db.scalars(select(Property)).all()
+
+    def column_load():
+        with engine.connect() as connection:
+            return [row._asdict() for row in connection.execute(select(*COLUMNS))]
+
+    def response_model(items):
+        content = asyncio.run(serialize_response(field=field, response_content={'items': items, 'next_cursor': None}))
+        return JSONResponse(content).body
+
+    def fast(items, mode):
+        serialization.SERIALIZATION_MODE = mode
+        return page_json.render({'items': items, 'next_cursor': None})
+
+    orm_items, column_items = orm_load(), column_load()
+    assert response_model(orm_items) == fast(column_items, 'validate') == fast(column_items, 'trusted')
+
+    print(f'{rows} rows, best of {repeat}')
+    timed('load: ORM objects', rows, repeat, orm_load)
+    timed('load: column rows as dicts', rows, repeat, column_load)
+    before = timed('encode: response_model + json', rows, repeat, lambda: response_model(orm_items))
+    validate = timed('encode: TypeAdapter (validate)', rows, repeat, lambda: fast(column_items, 'validate'))
+    trusted = timed('encode: orjson (trusted)', rows, repeat, lambda: fast(column_items, 'trusted'))
+    print(f'encode speedup: validate {before / validate:.1f}x, trusted {before / trusted:.1f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Cold start: import time of `main` and time to the first prediction, each in a fresh interpreter.
+
+Exits non-zero when a median exceeds its limit, so it can gate regressions in CI.
+
+    python benchmarks/startup.py [--runs 5] [--max-import 2.5] [--max-first-request 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+CHILD = '''
+import json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    started = time.perf_counter()
+    response = client.post('/predict/', json={'GrLivArea': 1500, 'YearBuilt': 2000, 'GarageCars': 2,
+                                              'TotalBsmtSF': 800, 'FullBath': 2, 'OverallQual': 7,
+                                              'Neighborhood': 'CollgCr'})
+    assert response.status_code == 200, response.text
+    answered = time.perf_counter()
+print(json.dumps({'import': imported - start, 'lifespan': started - imported, 'first_request': answered - start}))
+'''
+
+def setup(path: str):
+    sys.path.insert(0, str(ROOT))
+    os.environ['DATABASE_URL'] = f'sqlite+aiosqlite:///{path}'
+    from sqlalchemy import create_engine
+    from fast_house_kg.database.db import Base
+    import fast_house_kg.database.models
+    engine = create_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+def run_child(env: dict) -> dict:
+    result = subprocess.run([sys.executable, '-c', CHILD], cwd=ROOT, env=env, capture_output=True, text=True,
+                            check=False)
+    if result.returncode != 0:
+        raise SystemExit(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-import', type=float, default=2.5, help='seconds, median import of main')
+    parser.add_argument('--max-first-request', type=float, default=5.0,
+                        help='seconds, median from import to the first prediction answered')
+    parser.add_argument('--model-warmup', default=os.getenv('MODEL_WARMUP', 'startup'),
+                        choices=('startup', 'background'))
+    parser.add_argument('--admin', action='store_true', help='mount the admin, as ADMIN_ENABLED=true does')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'startup.db')
+        setup(path)
+        env = {**os.environ, 'DATABASE_URL': f'sqlite+aiosqlite:///{path}', 'SECRET_KEY': 'benchmark',
+               'MODEL_WARMUP': args.model_warmup, 'ADMIN_ENABLED': 'true' if args.admin else 'false',
+               'PYTHONWARNINGS': 'ignore'}
+        runs = [run_child(env) for _ in range(args.runs)]
+
+    medians = {name: statistics.median(run[name] for run in runs) for name in runs[0]}
+    print(f'{args.runs} runs, model warm-up {args.model_warmup}, admin {"on" if args.admin else "off"}, median')
+    for name, value in medians.items():
+        print(f'{name:<14} {value:7.3f} s')
+    failed = [f'{name} {medians[name]:.3f}s > {limit}s'
+              for name, limit in (('import', args.max_import), ('first_request', args.max_first_request))
+              if medians[name] > limit]
+    if failed:
+        print('regression: ' + ', '.join(failed))
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
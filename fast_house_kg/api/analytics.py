@@ -0,0 +1,44 @@
+from fast_house_kg.database.schema import PriceRollupOutSchema, PropertyChoices, RegionChoices
+from fast_house_kg.database.models import PriceRollup, ROLLUP_KEYS
+from fast_house_kg.database.rollups import summarize
+from fastapi import Depends, APIRouter, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from collections import defaultdict
+from fast_house_kg.database.db import get_db
+
+analytics_router = APIRouter(prefix='/analytics')
+
+@analytics_router.get('/prices/', response_model=List[PriceRollupOutSchema], response_model_exclude_unset=True,
+                      summary='Price statistics by group', tags=['Analytics'])
+async def price_analytics(group_by: List[str] = Query([], description='Any of ' + ', '.join(ROLLUP_KEYS)),
+                          region: Optional[RegionChoices] = None,
+                          city_id: Optional[int] = None,
+                          district_id: Optional[int] = None,
+                          property_type: Optional[PropertyChoices] = None,
+                          rooms: Optional[int] = None,
+                          db: AsyncSession = Depends(get_db)):
+    group_by = [name for name in ROLLUP_KEYS if name in group_by]
+    stmt = select(PriceRollup)
+    for name, value in (('region', region), ('city_id', city_id), ('district_id', district_id),
+                        ('property_type', property_type), ('rooms', rooms)):
+        if value is not None:
+            stmt = stmt.where(getattr(PriceRollup, name) == value)
+    groups = defaultdict(list)
+    for rollup in (await db.scalars(stmt)).all():
+        groups[tuple(getattr(rollup, name) for name in group_by)].append(rollup)
+    result = []
+    for key, rollups in groups.items():
+        count = sum(rollup.count for rollup in rollups)
+        result.append({
+            **dict(zip(group_by, key)),
+            'count': count,
+            'price': summarize(sum(rollup.price_sum for rollup in rollups), count,
+                               [rollup.price_histogram for rollup in rollups]),
+            'price_per_m2': summarize(sum(rollup.price_per_m2_sum for rollup in rollups),
+                                      sum(rollup.area_count for rollup in rollups),
+                                      [rollup.price_per_m2_histogram for rollup in rollups]),
+        })
+    result.sort(key=lambda item: tuple(str(item[name]) for name in group_by))
+    return result
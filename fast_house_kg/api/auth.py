@@ -1,35 +1,65 @@
-from fast_house_kg.database.db import SessionLocal
+from fast_house_kg.database.db import get_db
 from fast_house_kg.database.models import UserProfile, UserProfileRefreshToken
 from fast_house_kg.database.schema import UserProfileInputSchema, UserProfileLoginSchema
-from jose import jwt
+from fast_house_kg.api.tokens import REVOKED, hash_token, revocation_stmt, token_cache
+from fast_house_kg.metrics import password_hashing
 from datetime import datetime, timedelta
 from fastapi import HTTPException, Depends, APIRouter
-from fast_house_kg.config import ALGORITHM, ACCESS_TOKEN_LIFETIME, REFRESH_TOKEN_LIFETIME, SECRET_KEY
+from fast_house_kg.config import (ALGORITHM, ACCESS_TOKEN_LIFETIME, REFRESH_TOKEN_LIFETIME, SECRET_KEY, BCRYPT_ROUNDS,
+                                  PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from typing import Optional
-from sqlalchemy.orm import Session
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import asyncio
+import time
+import uuid
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 auth_router = APIRouter(prefix='/auth', tags=['Auth'])
 
-pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='password')
+password_pending = 0
 
 oauth2_schema = OAuth2PasswordBearer(tokenUrl='/auth/login')
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+@lru_cache(maxsize=None)
+def password_context():
+    # passlib and jose are imported on first use, keeping them off the app's import path.
+    from passlib.context import CryptContext
+    return CryptContext(schemes=['bcrypt'], deprecated='auto', bcrypt__default_rounds=BCRYPT_ROUNDS,
+                        bcrypt__min_rounds=BCRYPT_ROUNDS, bcrypt__max_rounds=BCRYPT_ROUNDS)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return password_context().hash(password)
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_context().verify(plain_password, hashed_password)
+
+def verify_and_update_password(plain_password, hashed_password):
+    return password_context().verify_and_update(plain_password, hashed_password)
+
+async def run_password_task(func, *args):
+    global password_pending
+    if password_pending >= PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(detail='Too many authentication requests, try again later.', status_code=503,
+                            headers={'Retry-After': '1'})
+    password_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, _timed, func, *args)
+    finally:
+        password_pending -= 1
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        password_hashing.observe(time.perf_counter() - start)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    from jose import jwt
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -40,41 +70,47 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 def create_refresh_token(data: dict):
-    return create_access_token(data, expires_delta=timedelta(days=REFRESH_TOKEN_LIFETIME))
+    return create_access_token({**data, 'jti': uuid.uuid4().hex}, expires_delta=timedelta(days=REFRESH_TOKEN_LIFETIME))
 
 @auth_router.post('/register/', response_model=dict, tags=['Auth'])
-async def register(user: UserProfileInputSchema, db: Session = Depends(get_db)):
-    username_db = db.query(UserProfile).filter(UserProfile.username==user.username).first()
-    email_db = db.query(UserProfile).filter(UserProfile.email==user.email).first()
+async def register(user: UserProfileInputSchema, db: AsyncSession = Depends(get_db)):
+    username_db = await db.scalar(select(UserProfile).where(UserProfile.username==user.username))
+    email_db = await db.scalar(select(UserProfile).where(UserProfile.email==user.email))
     if username_db:
         raise HTTPException(detail='This username already exists.', status_code=400)
     if email_db:
         raise HTTPException(detail='This email already exists.', status_code=400)
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await run_password_task(get_password_hash, user.password)
     user_db = UserProfile(
         username=user.username,
-        pasword=hashed_password,
+        password=hashed_password,
         email=user.email,
         status=user.status
     )
     db.add(user_db)
-    db.commit()
-    db.refresh(user_db)
+    await db.commit()
+    await db.refresh(user_db)
     return {'detail': 'Successfully registered in.'}
 
 @auth_router.post('/login/', response_model=dict, tags=['Auth'])
-async def login(user: UserProfileLoginSchema, db: Session = Depends(get_db)):
-    username_db1 = db.query(UserProfile).filter(UserProfile.username==user.username).first()
-    if not username_db1 or not verify_password(user.password, username_db1.password):
+async def login(user: UserProfileLoginSchema, db: AsyncSession = Depends(get_db)):
+    username_db1 = await db.scalar(select(UserProfile).where(UserProfile.username==user.username))
+    if not username_db1:
+        raise HTTPException(detail='Invalid credentials.', status_code=401)
+    valid, new_hash = await run_password_task(verify_and_update_password, user.password, username_db1.password)
+    if not valid:
         raise HTTPException(detail='Invalid credentials.', status_code=401)
+    if new_hash:
+        username_db1.password = new_hash
     access_token = create_access_token({'sub': username_db1.username})
     refresh_token = create_refresh_token({'sub': username_db1.username})
     token_db = UserProfileRefreshToken(
         user_id=username_db1.id,
-        token=refresh_token
+        token_hash=hash_token(refresh_token),
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_LIFETIME)
     )
     db.add(token_db)
-    db.commit()
+    await db.commit()
     return {
         'access': access_token,
         'refresh': refresh_token,
@@ -82,18 +118,35 @@ async def login(user: UserProfileLoginSchema, db: Session = Depends(get_db)):
     }
 
 @auth_router.post('/logout/', tags=['Auth'], response_model=dict)
-async def logout(refresh_token: str, db: Session = Depends(get_db)):
-    old_token = db.query(UserProfile).filter(UserProfileRefreshToken.token==refresh_token).first()
+async def logout(refresh_token: str, db: AsyncSession = Depends(get_db)):
+    token_hash = hash_token(refresh_token)
+    old_token = await db.scalar(select(UserProfileRefreshToken).where(UserProfileRefreshToken.token_hash==token_hash))
     if not old_token:
         raise HTTPException(detail='Invalid token.', status_code=401)
-    db.delete(old_token)
-    db.commit()
+    await db.delete(old_token)
+    await db.execute(revocation_stmt(db.get_bind().dialect.name))
+    await db.commit()
+    token_cache.revoke(token_hash)
     return {'detail': 'Successfully logged out.'}
 
 @auth_router.post('/refresh/', response_model=dict, tags=['Auth'])
-async def refresh(refresh_token: str, db: Session = Depends(get_db)):
-    stored_token = db.query(UserProfile).filter(UserProfileRefreshToken.token==refresh_token).first()
-    if not stored_token:
-        raise HTTPException(detail='Token already exists.', status_code=402)
-    access_token = create_access_token({'sub': stored_token.id})
+async def refresh(refresh_token: str, db: AsyncSession = Depends(get_db)):
+    from jose import JWTError, jwt
+    try:
+        jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise HTTPException(detail='Invalid token.', status_code=401)
+    token_hash = hash_token(refresh_token)
+    await token_cache.ensure_fresh(db)
+    stored_token = token_cache.get(token_hash)
+    if stored_token is None:
+        stored_token = (await db.execute(
+            select(UserProfile.username, UserProfileRefreshToken.expires_at)
+            .join(UserProfileRefreshToken.token_user)
+            .where(UserProfileRefreshToken.token_hash==token_hash)
+        )).first() or REVOKED
+        token_cache.set(token_hash, stored_token)
+    if stored_token is REVOKED or stored_token.expires_at <= datetime.utcnow():
+        raise HTTPException(detail='Invalid token.', status_code=401)
+    access_token = create_access_token({'sub': stored_token.username})
     return {'access_token': access_token, 'token_type': 'Bearer'}
\ No newline at end of file
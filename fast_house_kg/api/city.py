@@ -1,57 +1,54 @@
-from fast_house_kg.database.schema import CityOutSchema, CityInputSchema
+from fast_house_kg.database.schema import CityOutSchema, CityInputSchema, PageSchema
 from fast_house_kg.database.models import City
 from fastapi import HTTPException, Depends, APIRouter
-from sqlalchemy.orm import Session
-from typing import List
-from fast_house_kg.database.db import SessionLocal
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fast_house_kg.database.db import get_db
+from fast_house_kg.api.pagination import PageParams
+from fast_house_kg.api.reference import city_cache
 
 city_router = APIRouter(prefix='/city')
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @city_router.post('/', response_model=CityOutSchema, tags=['City'], summary='Create city')
-async def create_city(city: CityInputSchema, db: Session = Depends(get_db)):
-    city_db = City(**city.dict())
+async def create_city(city: CityInputSchema, db: AsyncSession = Depends(get_db)):
+    city_db = City(**city.model_dump())
     db.add(city_db)
-    db.commit()
-    db.refresh(city_db)
+    await db.commit()
+    await db.refresh(city_db)
     return city_db
 
-@city_router.get('/', response_model=List[CityOutSchema], summary='Get all cities', tags=['City'])
-async def cities_list(db: Session = Depends(get_db)):
-    cities_db = db.query(City).all()
-    if not cities_db:
+@city_router.get('/', response_model=PageSchema[CityOutSchema], summary='Get all cities', tags=['City'])
+async def cities_list(params: PageParams = Depends(), db: AsyncSession = Depends(get_db)):
+    await city_cache.ensure_fresh(db)
+    cities_db = city_cache.page(params)
+    if not cities_db['items'] and params.after is None:
         raise HTTPException(detail='No cities.', status_code=404)
     return cities_db
 
 @city_router.get('/{city_id}/', response_model=CityOutSchema, summary='Get city by id', tags=['City'])
-async def city_detail(city_id: int, db: Session = Depends(get_db)):
-    city_db1 = db.query(City).filter(City.id==city_id).first()
+async def city_detail(city_id: int, db: AsyncSession = Depends(get_db)):
+    await city_cache.ensure_fresh(db)
+    city_db1 = city_cache.get(city_id)
     if not city_db1:
         raise HTTPException(detail='No city by this id.', status_code=404)
     return city_db1
 
 @city_router.put('/{city_id}/', response_model=dict, summary='Change city', tags=['City'])
-async def city_update(city_id: int, city: CityInputSchema, db: Session = Depends(get_db)):
-    city_db2 = db.query(City).filter(City.id==city_id).first()
+async def city_update(city_id: int, city: CityInputSchema, db: AsyncSession = Depends(get_db)):
+    city_db2 = await db.scalar(select(City).where(City.id==city_id))
     if not city_db2:
         raise HTTPException(detail='No city by this id.', status_code=404)
     for key, value in city.model_dump().items():
         setattr(city_db2, key, value)
-    db.commit()
-    db.refresh(city_db2)
+    await db.commit()
+    await db.refresh(city_db2)
     return {'detail': 'City has been changed.'}
 
 @city_router.delete('/{city_id}/', response_model=dict, summary='Delete city', tags=['City'])
-async def city_delete(city_id: int, db: Session = Depends(get_db)):
-    city_db3 = db.query(City).filter(City.id==city_id).first()
+async def city_delete(city_id: int, db: AsyncSession = Depends(get_db)):
+    city_db3 = await db.scalar(select(City).where(City.id==city_id))
     if not city_db3:
         raise HTTPException(detail='No city by this id.', status_code=404)
-    db.delete(city_db3)
-    db.commit()
+    await db.delete(city_db3)
+    await db.commit()
     return {'detail': 'City has been deleted.'}
\ No newline at end of file
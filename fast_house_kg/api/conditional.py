@@ -0,0 +1,31 @@
+import hashlib
+from typing import Iterable, Optional
+from fastapi import Request, Response
+from fast_house_kg.config import CACHE_CONTROL
+
+def row_etag(row_id: int, version: int) -> str:
+    return f'"{row_id}-{version}"'
+
+def page_etag(rows: Iterable, key: str = '') -> str:
+    digest = hashlib.sha1(key.encode())
+    for row in rows:
+        digest.update(f'{row.id}-{row.version},'.encode())
+    return f'"{digest.hexdigest()}"'
+
+def cache_headers(route: str, etag: str) -> dict:
+    headers = {'ETag': etag}
+    if route in CACHE_CONTROL:
+        headers['Cache-Control'] = CACHE_CONTROL[route]
+    return headers
+
+def not_modified(request: Request, route: str, etag: str) -> Optional[Response]:
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is None:
+        return None
+    tags = {tag.strip() for tag in if_none_match.split(',')}
+    if etag in tags or '*' in tags:
+        return Response(status_code=304, headers=cache_headers(route, etag))
+    return None
+
+def set_cache_headers(response: Response, route: str, etag: str):
+    response.headers.update(cache_headers(route, etag))
@@ -0,0 +1,81 @@
+import re
+from typing import Optional
+from fastapi import Query
+from sqlalchemy import Float, Select, column, func, literal_column, table
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from fast_house_kg.database.models import Property
+from fast_house_kg.database.schema import PropertyChoices, RegionChoices, ConditionChoices
+
+SORT_COLUMNS = {
+    'id': Property.id,
+    'price': Property.price,
+    'area': Property.area,
+    'rooms': Property.rooms,
+    'floor': Property.floor,
+    'created_date': Property.created_date,
+}
+
+class PropertyFilter:
+    def __init__(self,
+                 price_min: Optional[int] = Query(None, ge=0), price_max: Optional[int] = Query(None, ge=0),
+                 area_min: Optional[int] = Query(None, ge=0), area_max: Optional[int] = Query(None, ge=0),
+                 rooms_min: Optional[int] = Query(None, ge=0), rooms_max: Optional[int] = Query(None, ge=0),
+                 floor_min: Optional[int] = Query(None), floor_max: Optional[int] = Query(None),
+                 property_type: Optional[PropertyChoices] = None,
+                 region: Optional[RegionChoices] = None,
+                 city_id: Optional[int] = None,
+                 district_id: Optional[int] = None,
+                 condition: Optional[ConditionChoices] = None):
+        self.ranges = [
+            (Property.price, price_min, price_max),
+            (Property.area, area_min, area_max),
+            (Property.rooms, rooms_min, rooms_max),
+            (Property.floor, floor_min, floor_max),
+        ]
+        self.equals = [
+            (Property.property_type, property_type),
+            (Property.region, region),
+            (Property.city_id, city_id),
+            (Property.district_id, district_id),
+            (Property.condition, condition),
+        ]
+
+    def apply(self, stmt: Select) -> Select:
+        for column, value in self.equals:
+            if value is not None:
+                stmt = stmt.where(column == value)
+        for column, low, high in self.ranges:
+            if low is not None:
+                stmt = stmt.where(column >= low)
+            if high is not None:
+                stmt = stmt.where(column <= high)
+        return stmt
+
+class PropertySort:
+    def __init__(self, sort: str = Query('id', pattern='^-?(' + '|'.join(SORT_COLUMNS) + ')$',
+                                         description='Sort column, prefix with - for descending.')):
+        self.descending = sort.startswith('-')
+        column = SORT_COLUMNS[sort.lstrip('-')]
+        self.columns = [column] if column is Property.id else [column, Property.id]
+
+property_fts = table('property_fts', column('rowid'))
+search_vector = literal_column('property.search_vector', TSVECTOR)
+
+class PropertyTextSearch:
+    def __init__(self, q: str = Query(min_length=1, max_length=200, description='Words to search for.')):
+        self.q = q
+        self.terms = re.findall(r'\w+', q)
+
+    def apply(self, stmt: Select, dialect: str):
+        """Restrict stmt to matching rows; returns it with a rank where higher is a better match."""
+        if dialect == 'sqlite':
+            # Quote every word so FTS5 operators in user input are matched literally; title counts double.
+            query = ' '.join(f'"{term}"' for term in self.terms)
+            rank = (-func.bm25(literal_column('property_fts'), 2.0, 1.0, type_=Float)).label('rank')
+            stmt = (stmt.add_columns(rank).join(property_fts, property_fts.c.rowid == Property.id)
+                    .where(literal_column('property_fts').op('MATCH')(query)))
+        else:
+            query = func.websearch_to_tsquery('simple', self.q)
+            rank = func.ts_rank_cd(search_vector, query, type_=Float).label('rank')
+            stmt = stmt.add_columns(rank).where(search_vector.op('@@')(query))
+        return stmt, rank
@@ -0,0 +1,103 @@
+import asyncio
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+import anyio
+from fastapi import HTTPException, Depends, APIRouter, File, Request, UploadFile
+from fastapi.responses import FileResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fast_house_kg.database.schema import PropertyMediaOutSchema
+from fast_house_kg.database.models import Property, PropertyMedia, MediaKindChoices
+from fast_house_kg.database.db import get_db
+from fast_house_kg.config import MEDIA_DIR, MEDIA_MAX_BYTES, MEDIA_WIDTHS, MEDIA_WEBP_QUALITY, MEDIA_WORKERS
+from fast_house_kg.api.conditional import cache_headers, not_modified
+from fast_house_kg.media.store import MediaStore, MediaTooLarge
+from fast_house_kg.media.variants import make_variants
+
+media_router = APIRouter(prefix='/media', tags=['Media'])
+
+DOCUMENT_TYPES = ('application/pdf',)
+PDF_MAGIC = b'%PDF-'
+DIGEST = re.compile('[0-9a-f]{64}')
+
+media_store = MediaStore(MEDIA_DIR)
+# Decoding and resizing are CPU-bound, so they run in worker processes rather than on the event loop.
+media_executor = ProcessPoolExecutor(MEDIA_WORKERS)
+
+def _file_response(request: Request, path, media_type: str, etag: str):
+    if cached := not_modified(request, 'media', etag):
+        return cached
+    return FileResponse(path, media_type=media_type,
+                        headers={**cache_headers('media', etag), 'X-Content-Type-Options': 'nosniff'})
+
+async def _describe(upload: UploadFile, digest: str) -> dict:
+    if upload.content_type in DOCUMENT_TYPES:
+        # The declared content type is the client's word; it is served back as-is, so check the file is a PDF.
+        async with await anyio.open_file(media_store.path(digest), 'rb') as stored:
+            if await stored.read(len(PDF_MAGIC)) != PDF_MAGIC:
+                raise HTTPException(detail='Only images and PDF documents can be uploaded.', status_code=415)
+        return {'kind': MediaKindChoices.document, 'content_type': upload.content_type, 'variants': []}
+    targets = {width: str(media_store.variant_path(digest, width)) for width in MEDIA_WIDTHS}
+    try:
+        info = await asyncio.get_running_loop().run_in_executor(
+            media_executor, make_variants, str(media_store.path(digest)), targets, MEDIA_WEBP_QUALITY)
+    except (OSError, ValueError):
+        raise HTTPException(detail='Only images and PDF documents can be uploaded.', status_code=415)
+    return {'kind': MediaKindChoices.image, **info, 'variants': sorted(MEDIA_WIDTHS)}
+
+@media_router.post('/property/{property_id}/', response_model=List[PropertyMediaOutSchema],
+                   summary='Upload property images or documents')
+async def media_upload(property_id: int, files: List[UploadFile] = File(...), db: AsyncSession = Depends(get_db)):
+    if await db.scalar(select(Property.id).where(Property.id == property_id)) is None:
+        raise HTTPException(detail='No property by this id.', status_code=404)
+    media_db = []
+    # Blobs this request added to the store; a later file failing (413, 415) or the commit failing removes them.
+    created = []
+    try:
+        for upload in files:
+            try:
+                stored = await media_store.save(upload, MEDIA_MAX_BYTES)
+            except MediaTooLarge:
+                raise HTTPException(detail=f'Files are limited to {MEDIA_MAX_BYTES} bytes.', status_code=413)
+            if stored.created:
+                created.append(stored.sha256)
+            existing = await db.scalar(select(PropertyMedia).where(PropertyMedia.property_id == property_id,
+                                                                   PropertyMedia.sha256 == stored.sha256))
+            if existing is not None:
+                media_db.append(existing)
+                continue
+            media = PropertyMedia(property_id=property_id, sha256=stored.sha256, size=stored.size,
+                                  filename=upload.filename, **await _describe(upload, stored.sha256))
+            db.add(media)
+            media_db.append(media)
+        await db.commit()
+    except BaseException:
+        with anyio.CancelScope(shield=True):
+            for digest in created:
+                await media_store.remove(digest, MEDIA_WIDTHS)
+        raise
+    return media_db
+
+@media_router.get('/property/{property_id}/', response_model=List[PropertyMediaOutSchema],
+                  summary='List property media')
+async def media_list(property_id: int, db: AsyncSession = Depends(get_db)):
+    return (await db.scalars(select(PropertyMedia).where(PropertyMedia.property_id == property_id)
+                             .order_by(PropertyMedia.id))).all()
+
+@media_router.get('/{digest}/', summary='Download original media')
+async def media_original(digest: str, request: Request, db: AsyncSession = Depends(get_db)):
+    content_type = None
+    if DIGEST.fullmatch(digest):
+        content_type = await db.scalar(select(PropertyMedia.content_type)
+                                       .where(PropertyMedia.sha256 == digest).limit(1))
+    if content_type is None:
+        raise HTTPException(detail='No media by this hash.', status_code=404)
+    return _file_response(request, media_store.path(digest), content_type, f'"{digest}"')
+
+@media_router.get('/{digest}/{width}.webp', summary='Download resized WebP image')
+async def media_variant(digest: str, width: int, request: Request):
+    path = media_store.variant_path(digest, width)
+    if not DIGEST.fullmatch(digest) or width not in MEDIA_WIDTHS or not await anyio.Path(path).is_file():
+        raise HTTPException(detail='No media by this hash and width.', status_code=404)
+    return _file_response(request, path, 'image/webp', f'"{digest}-{width}"')
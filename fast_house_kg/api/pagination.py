@@ -0,0 +1,60 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import List, Optional
+from fastapi import HTTPException, Query
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from fast_house_kg.config import PAGE_DEFAULT_LIMIT, PAGE_MAX_LIMIT
+
+class PageParams:
+    def __init__(self, limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+                 after: Optional[str] = Query(None, description='Opaque cursor from the previous page.')):
+        self.limit = limit
+        self.after = after
+
+def encode_cursor(values: list) -> str:
+    payload = json.dumps([value.isoformat() if isinstance(value, (date, datetime)) else value for value in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str, columns: list) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+        return [_coerce(column, value) for column, value in zip(columns, values)]
+    except (ValueError, TypeError):
+        raise HTTPException(detail='Invalid cursor.', status_code=400)
+
+def _coerce(column, value):
+    python_type = column.type.python_type
+    if value is not None and python_type in (date, datetime):
+        return python_type.fromisoformat(value)
+    return value
+
+def keyset(stmt: Select, columns: list, params: PageParams, descending: bool = False) -> Select:
+    if params.after is not None:
+        values = decode_cursor(params.after, columns)
+        key, bound = tuple_(*columns), tuple_(*values)
+        stmt = stmt.where(key < bound if descending else key > bound)
+    order = [column.desc() if descending else column.asc() for column in columns]
+    return stmt.order_by(*order).limit(params.limit + 1)
+
+def page(rows: list, columns: list, params: PageParams) -> dict:
+    next_cursor = None
+    if len(rows) > params.limit:
+        rows = rows[:params.limit]
+        next_cursor = encode_cursor([_value(rows[-1], column) for column in columns])
+    return {'items': rows, 'next_cursor': next_cursor}
+
+def _value(row, column):
+    if isinstance(row, dict):
+        return row[column.key]
+    return getattr(row, column.key)
+
+async def paginate_rows(db: AsyncSession, stmt: Select, columns: List, params: PageParams,
+                        descending: bool = False) -> dict:
+    rows = (await db.execute(keyset(stmt, columns, params, descending))).all()
+    result = page(rows, columns, params)
+    result['items'] = [row._asdict() for row in result['items']]
+    return result
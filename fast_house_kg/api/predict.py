@@ -1,43 +1,176 @@
-import joblib
-from fastapi import APIRouter
+import asyncio
+import json
+import logging
+import time
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import ValidationError
+from typing import List, Optional
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from fast_house_kg.api.utils import iter_json_rows
+from fast_house_kg.config import (PREDICT_MAX_BATCH_SIZE, PREDICT_MAX_WAIT_MS, PREDICT_WORKERS, MODEL_VERSION,
+                                  MODEL_SYNC_INTERVAL, PREDICT_CACHE_SIZE, PREDICT_CACHE_TTL, PREDICT_CACHE_SQLITE)
+from fast_house_kg.ml.batcher import PredictionBatcher
+from fast_house_kg.ml.cache import PredictionCache, SQLiteCacheBackend
+from fast_house_kg.ml.registry import ModelVersion, registry
+from fast_house_kg.ml.features import FEATURE_COUNT, NUMERIC_FEATURES, NEIGHBORHOOD_INDEX, encode_houses
+from fast_house_kg.ml.revalue import lock_holder, revalue_properties
+from fast_house_kg.metrics import Counter, Gauge, model_inference
+from fast_house_kg.database.db import get_db
 from fast_house_kg.database.schema import HousePredictSchema
 
-scaler = joblib.load('scaler (1).pkl')
-model = joblib.load('model (1).pkl')
+logger = logging.getLogger(__name__)
+
+cache = PredictionCache(PREDICT_CACHE_SIZE, PREDICT_CACHE_TTL,
+                        shared=SQLiteCacheBackend(PREDICT_CACHE_SQLITE, PREDICT_CACHE_TTL) if PREDICT_CACHE_SQLITE else None)
+registry.on_activate(lambda model_version: cache.clear())
 
 predict_router = APIRouter(prefix='/predict', tags=['Predict Price'])
 
+model_loading: Optional[asyncio.Task] = None
+
+def warm_model() -> ModelVersion:
+    # A version published by an activate or rollback outlives restarts and wins over MODEL_VERSION.
+    model_version = registry.active or registry.sync() or registry.activate(MODEL_VERSION)
+    # The first predict pulls in scikit-learn code that is imported lazily.
+    model_version.predict(np.zeros((1, FEATURE_COUNT)))
+    return model_version
+
+async def ensure_model() -> ModelVersion:
+    """Loads MODEL_VERSION on a thread once; concurrent callers wait for the same load."""
+    global model_loading
+    if registry.active is not None:
+        return registry.active
+    if model_loading is None or model_loading.done():
+        model_loading = asyncio.create_task(asyncio.to_thread(warm_model))
+    return await asyncio.shield(model_loading)
+
+async def follow_published_model():
+    """Keeps this worker on the version activated or rolled back through any worker."""
+    while True:
+        await asyncio.sleep(MODEL_SYNC_INTERVAL)
+        if registry.active is None:
+            continue
+        try:
+            await asyncio.to_thread(registry.sync)
+        except Exception:
+            logger.exception('Could not activate the published model version.')
+
+def cache_key(model_key: str, house: HousePredictSchema) -> tuple:
+    neighborhood = house.Neighborhood if house.Neighborhood in NEIGHBORHOOD_INDEX else ''
+    return (model_key, *(getattr(house, name) for name in NUMERIC_FEATURES), neighborhood)
+
+def predict_houses(houses: List[HousePredictSchema]) -> List[float]:
+    if not houses:
+        return []
+    model_version = registry.active
+    keys = [cache_key(model_version.cache_key, house) for house in houses]
+    shared = cache.shared_get_many(keys)
+    results = [shared.get(key) for key in keys]
+    missing = [i for i, key in enumerate(keys) if key not in shared]
+    if missing:
+        start = time.perf_counter()
+        predicted = model_version.predict(encode_houses([houses[i] for i in missing])).tolist()
+        model_inference.observe(time.perf_counter() - start)
+        for i, value in zip(missing, predicted):
+            results[i] = value
+        cache.shared_set_many({keys[i]: results[i] for i in missing})
+    for key, value in zip(keys, results):
+        cache.set(key, value)
+    return results
+
+batcher = PredictionBatcher(predict_houses, max_batch_size=PREDICT_MAX_BATCH_SIZE,
+                            max_wait_ms=PREDICT_MAX_WAIT_MS, workers=PREDICT_WORKERS)
+
+Gauge('predict_queue_depth', 'Single-row predictions waiting to be batched.',
+      function=lambda: {(): batcher.stats()['queue_depth']})
+Counter('predict_batches_total', 'Coalesced prediction batches run.', function=lambda: {(): batcher.batches})
+Counter('predict_cache_events_total', 'Prediction cache lookups by outcome.', ('event',), function=lambda: {
+    (name,): value for name, value in cache.stats().items()
+    if name in ('hits', 'misses', 'evictions', 'expirations', 'shared_hits', 'shared_misses')
+})
+
 @predict_router.post('/')
 async def predict_price(house: HousePredictSchema):
-    house_dict = house.dict()
-    new_neighborhood = house_dict.pop('Neighborhood')
-    neighborhood1or_0 = [
-        1 if new_neighborhood == 'Blueste' else 0,
-        1 if new_neighborhood == 'BrDale' else 0,
-        1 if new_neighborhood == 'BrkSide' else 0,
-        1 if new_neighborhood == 'ClearCr' else 0,
-        1 if new_neighborhood == 'CollgCr' else 0,
-        1 if new_neighborhood == 'Crawfor' else 0,
-        1 if new_neighborhood == 'Edwards' else 0,
-        1 if new_neighborhood == 'Gilbert' else 0,
-        1 if new_neighborhood == 'IDOTRR' else 0,
-        1 if new_neighborhood == 'MeadowV' else 0,
-        1 if new_neighborhood == 'Mitchel' else 0,
-        1 if new_neighborhood == 'NAmes' else 0,
-        1 if new_neighborhood == 'NPkVill' else 0,
-        1 if new_neighborhood == 'NWAmes' else 0,
-        1 if new_neighborhood == 'NoRidge' else 0,
-        1 if new_neighborhood == 'NridgHt' else 0,
-        1 if new_neighborhood == 'OldTown' else 0,
-        1 if new_neighborhood == 'SWISU' else 0,
-        1 if new_neighborhood == 'Sawyer' else 0,
-        1 if new_neighborhood == 'SawyerW' else 0,
-        1 if new_neighborhood == 'Somerst' else 0,
-        1 if new_neighborhood == 'StoneBr' else 0,
-        1 if new_neighborhood == 'Timber' else 0,
-        1 if new_neighborhood == 'Veenker' else 0,
-    ]
-    features = list(house_dict.values()) + neighborhood1or_0
-    scaled_data = scaler.transform([features])
-    predict = model.predict(scaled_data)[0]
-    return {'Price predict': predict}
\ No newline at end of file
+    model_version = await ensure_model()
+    predict = cache.get(cache_key(model_version.cache_key, house))
+    if predict is None:
+        predict = await batcher.predict(house)
+    return {'Price predict': predict}
+
+@predict_router.post('/batch/', summary='Predict prices for a JSON array or NDJSON of houses')
+async def predict_price_batch(request: Request):
+    results, houses, indexes = [], [], []
+    model_key = (await ensure_model()).cache_key
+    index = 0
+    async for row in iter_json_rows(request):
+        try:
+            house = HousePredictSchema.model_validate(row)
+        except ValidationError as e:
+            # The index identifies the row; echoing its input back could fail to render (ints past 64 bits).
+            results.append({'index': index, 'errors': json.loads(e.json(include_url=False, include_input=False))})
+        else:
+            predict = cache.get(cache_key(model_key, house))
+            if predict is None:
+                houses.append(house)
+                indexes.append(index)
+            else:
+                results.append({'index': index, 'Price predict': predict})
+        index += 1
+    for i, predict in zip(indexes, await batcher.predict_each(houses)):
+        if isinstance(predict, Exception):
+            logger.warning('Prediction failed for batch row %s: %r', i, predict)
+            results.append({'index': i, 'errors': [{'type': 'prediction_failed', 'msg': str(predict)}]})
+        else:
+            results.append({'index': i, 'Price predict': predict})
+    results.sort(key=lambda result: result['index'])
+    return results
+
+@predict_router.get('/stats/', summary='Prediction batching and cache metrics')
+async def predict_stats():
+    return {'batcher': batcher.stats(), 'cache': cache.stats()}
+
+@predict_router.get('/models/', summary='Loaded and available model versions')
+async def models_list():
+    return registry.info()
+
+@predict_router.post('/models/{version}/activate/', summary='Activate model version')
+async def model_activate(version: str):
+    try:
+        model_version = await asyncio.to_thread(registry.activate, version)
+    except KeyError:
+        raise HTTPException(detail='No model by this version.', status_code=404)
+    registry.publish(model_version.version)
+    return model_version.info()
+
+@predict_router.post('/models/rollback/', summary='Roll back to previous model version')
+async def model_rollback():
+    try:
+        model_version = registry.rollback()
+    except LookupError:
+        raise HTTPException(detail='No previous model version.', status_code=409)
+    registry.publish(model_version.version)
+    return model_version.info()
+
+revalue_task: Optional[asyncio.Task] = None
+revalue_progress: dict = {}
+
+@predict_router.post('/models/revalue/', status_code=202, summary='Re-score stale listings with the active model')
+async def model_revalue(restart: bool = False, db: AsyncSession = Depends(get_db)):
+    global revalue_task
+    model_version = await ensure_model()
+    if revalue_task is not None and not revalue_task.done():
+        raise HTTPException(detail='Re-valuation is already running.', status_code=409)
+    holder = await lock_holder(db)
+    if holder is not None:
+        # Another process (the CLI, another worker) holds the lock; the run itself would fail on it anyway.
+        raise HTTPException(detail=f'Re-valuation is already running ({holder}).', status_code=409)
+    revalue_progress.clear()
+    revalue_task = asyncio.create_task(revalue_properties(model_version, restart=restart, progress=revalue_progress))
+    return {'model_version': model_version.version, 'restart': restart}
+
+@predict_router.get('/models/revalue/', summary='Re-valuation progress')
+async def model_revalue_status():
+    if revalue_task is not None and revalue_task.done() and revalue_task.exception() is not None:
+        return {**revalue_progress, 'error': repr(revalue_task.exception())}
+    return revalue_progress
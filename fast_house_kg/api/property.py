@@ -1,57 +1,242 @@
-from fast_house_kg.database.schema import PropertyOutSchema, PropertyInputSchema
-from fast_house_kg.database.models import Property
-from fastapi import HTTPException, Depends, APIRouter
-from sqlalchemy.orm import Session
+import csv
+import io
+import json
+from enum import Enum
 from typing import List
-from fast_house_kg.database.db import SessionLocal
+from datetime import date, datetime
+from fastapi import HTTPException, Depends, APIRouter, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import select, tuple_
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from fast_house_kg.database.schema import (PropertyOutSchema, PropertyInputSchema, PageSchema, BulkResultSchema,
+                                           SimilarPropertySchema)
+from fast_house_kg.database.models import Property, ROLLUP_KEYS, rollup_dirty_stmt
+from fast_house_kg.database.db import get_db, is_read_only, SessionLocal, dialect_insert
+from fast_house_kg.config import EXPORT_CHUNK_SIZE, BULK_CHUNK_SIZE, PAGE_MAX_LIMIT
+from fast_house_kg.api.utils import iter_json_rows
+from fast_house_kg.api.pagination import PageParams, paginate_rows, keyset
+from fast_house_kg.api.conditional import row_etag, page_etag, not_modified, set_cache_headers, cache_headers
+from fast_house_kg.api.serialization import FastJSON, schema_columns
+from fast_house_kg.api.filters import PropertyFilter, PropertySort, PropertyTextSearch
+from fast_house_kg.api.similar import SIMILAR_COLUMNS, pending_changes, raw_features, similar_index
 
 property_router = APIRouter(prefix='/property')
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+EXPORT_COLUMNS = schema_columns(Property, PropertyOutSchema)
+property_page_json = FastJSON(PageSchema[PropertyOutSchema])
+
+def _json_default(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(value)
+
+def _csv_value(value):
+    return value.value if isinstance(value, Enum) else value
+
+async def _stream_partitions(stmt, read_only: bool):
+    async with SessionLocal(info={'read_only': read_only}) as db:
+        result = await db.stream(stmt.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+        async for partition in result.partitions():
+            yield partition
+
+async def _export_ndjson(stmt, read_only: bool):
+    async for partition in _stream_partitions(stmt, read_only):
+        yield ''.join(json.dumps(dict(zip(PropertyOutSchema.model_fields, row)), default=_json_default) + '\n'
+                      for row in partition)
+
+async def _export_csv(stmt, read_only: bool):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(PropertyOutSchema.model_fields)
+    async for partition in _stream_partitions(stmt, read_only):
+        writer.writerows([_csv_value(value) for value in row] for row in partition)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+async def _write_chunk(db: AsyncSession, rows: list, upsert: bool) -> int:
+    dialect = db.get_bind().dialect.name
+    # Core inserts skip the mapper events, so mark the touched price rollups and similar-index rows here.
+    dirty = {tuple(row[name] for name in ROLLUP_KEYS) for row in rows}
+    if upsert:
+        existing = await db.execute(
+            select(*(getattr(Property, name) for name in ROLLUP_KEYS))
+            .where(tuple_(Property.seller_id, Property.external_id)
+                   .in_([(row['seller_id'], row['external_id']) for row in rows]))
+        )
+        dirty.update(tuple(row) for row in existing)
+    insert = dialect_insert(dialect)
+    stmt = insert(Property).values(rows)
+    if upsert:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Property.seller_id, Property.external_id],
+            set_={**{name: stmt.excluded[name] for name in rows[0] if name not in ('seller_id', 'external_id')},
+                  'version': Property.version + 1, 'updated_at': datetime.utcnow(), 'model_version': None},
+        )
+    written = await db.execute(stmt.returning(*SIMILAR_COLUMNS))
+    pending_changes(db.sync_session).extend((row.id, raw_features(row)) for row in written)
+    await db.execute(rollup_dirty_stmt(dialect, dirty))
+    await db.commit()
+    return len(rows)
+
+def _dedupe_upserts(rows: list, indexes: list, errors: list):
+    """Keeps the last row per (seller_id, external_id); ON CONFLICT DO UPDATE can't hit a row twice per statement."""
+    latest = {}
+    for row, index in zip(rows, indexes):
+        key = (row['seller_id'], row['external_id'])
+        if key in latest:
+            errors.append({'index': latest[key][1],
+                           'errors': [f'Superseded by row {index} with the same seller_id and external_id.']})
+        latest[key] = (row, index)
+    kept = sorted(latest.values(), key=lambda item: item[1])
+    return [row for row, _ in kept], [index for _, index in kept]
 
 @property_router.post('/', response_model=PropertyOutSchema, tags=['Property'], summary='Create property')
-async def create_property(property: PropertyInputSchema, db: Session = Depends(get_db)):
-    property_db = Property(**property.dict())
+async def create_property(property: PropertyInputSchema, db: AsyncSession = Depends(get_db)):
+    property_db = Property(**property.model_dump())
     db.add(property_db)
-    db.commit()
-    db.refresh(property_db)
+    await db.commit()
+    await db.refresh(property_db)
     return property_db
 
-@property_router.get('/', response_model=List[PropertyOutSchema], summary='Get all properties', tags=['Property'])
-async def properties_list(db: Session = Depends(get_db)):
-    properties_db = db.query(Property).all()
-    if not properties_db:
+@property_router.post('/bulk/', response_model=BulkResultSchema, tags=['Property'],
+                      summary='Bulk create properties from a JSON array or NDJSON')
+async def properties_bulk(request: Request, mode: str = Query('insert', pattern='^(insert|upsert)$'),
+                          db: AsyncSession = Depends(get_db)):
+    upsert = mode == 'upsert'
+    errors, chunk, indexes = [], [], []
+    written = index = 0
+
+    async def flush():
+        nonlocal written
+        rows, row_indexes = _dedupe_upserts(chunk, indexes, errors) if upsert else (list(chunk), list(indexes))
+        chunk.clear()
+        indexes.clear()
+        try:
+            written += await _write_chunk(db, rows, upsert)
+        except DBAPIError:
+            await db.rollback()
+            # Retry row by row so each failure is reported against its own index.
+            for row, index in zip(rows, row_indexes):
+                try:
+                    written += await _write_chunk(db, [row], upsert)
+                except DBAPIError as e:
+                    await db.rollback()
+                    errors.append({'index': index, 'errors': [str(e.orig)]})
+
+    async for row in iter_json_rows(request):
+        try:
+            property = PropertyInputSchema.model_validate(row)
+            if upsert and property.external_id is None:
+                raise ValueError('external_id is required in upsert mode.')
+        except ValidationError as e:
+            errors.append({'index': index, 'errors': json.loads(e.json(include_url=False))})
+        except ValueError as e:
+            errors.append({'index': index, 'errors': [str(e)]})
+        else:
+            chunk.append(property.model_dump())
+            indexes.append(index)
+            if len(chunk) >= BULK_CHUNK_SIZE:
+                await flush()
+        index += 1
+    if chunk:
+        await flush()
+    errors.sort(key=lambda error: error['index'])
+    return {'received': index, 'written': written, 'errors': errors}
+
+@property_router.get('/', response_model=PageSchema[PropertyOutSchema], summary='Get all properties', tags=['Property'])
+async def properties_list(request: Request, params: PageParams = Depends(), db: AsyncSession = Depends(get_db)):
+    versions = (await db.execute(keyset(select(Property.id, Property.version), [Property.id], params))).all()
+    etag = page_etag(versions, f'{params.limit}:{params.after}')
+    if cached := not_modified(request, 'properties_list', etag):
+        return cached
+    properties_db = await paginate_rows(db, select(*EXPORT_COLUMNS), [Property.id], params)
+    if not properties_db['items'] and params.after is None:
         raise HTTPException(detail='No properties.', status_code=404)
-    return properties_db
+    return property_page_json.response(properties_db, cache_headers('properties_list', etag))
+
+@property_router.get('/search/', response_model=PageSchema[PropertyOutSchema], summary='Search properties',
+                     tags=['Property'])
+async def properties_search(filters: PropertyFilter = Depends(), sort: PropertySort = Depends(),
+                            params: PageParams = Depends(), db: AsyncSession = Depends(get_db)):
+    properties_db = await paginate_rows(db, filters.apply(select(*EXPORT_COLUMNS)), sort.columns, params,
+                                        sort.descending)
+    return property_page_json.response(properties_db)
+
+@property_router.get('/search/text/', response_model=PageSchema[PropertyOutSchema],
+                     summary='Full-text search in title and description', tags=['Property'])
+async def properties_text_search(search: PropertyTextSearch = Depends(), filters: PropertyFilter = Depends(),
+                                 params: PageParams = Depends(), db: AsyncSession = Depends(get_db)):
+    if not search.terms:
+        return {'items': [], 'next_cursor': None}
+    stmt, rank = search.apply(filters.apply(select(*EXPORT_COLUMNS)), db.get_bind().dialect.name)
+    properties_db = await paginate_rows(db, stmt, [rank, Property.id], params, descending=True)
+    for item in properties_db['items']:
+        del item['rank']
+    return property_page_json.response(properties_db)
+
+@property_router.get('/export/', summary='Export properties as NDJSON or CSV', tags=['Property'])
+async def properties_export(request: Request,
+                            export_format: str = Query('ndjson', alias='format', pattern='^(ndjson|csv)$'),
+                            filters: PropertyFilter = Depends()):
+    stmt = filters.apply(select(*EXPORT_COLUMNS)).order_by(Property.id)
+    # The stream outlives the request's dependencies, so it opens its own session, on a replica where allowed.
+    read_only = is_read_only(request)
+    if export_format == 'csv':
+        return StreamingResponse(_export_csv(stmt, read_only), media_type='text/csv',
+                                 headers={'Content-Disposition': 'attachment; filename="properties.csv"'})
+    return StreamingResponse(_export_ndjson(stmt, read_only), media_type='application/x-ndjson')
 
 @property_router.get('/{property_id}/', response_model=PropertyOutSchema, summary='Get property by id', tags=['Property'])
-async def property_detail(property_id: int, db: Session = Depends(get_db)):
-    property_db1 = db.query(Property).filter(Property.id == property_id).first()
+async def property_detail(property_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    version = await db.scalar(select(Property.version).where(Property.id == property_id))
+    if version is None:
+        raise HTTPException(detail='No property by this id.', status_code=404)
+    etag = row_etag(property_id, version)
+    if cached := not_modified(request, 'property_detail', etag):
+        return cached
+    property_db1 = await db.scalar(select(Property).where(Property.id == property_id))
     if not property_db1:
         raise HTTPException(detail='No property by this id.', status_code=404)
+    set_cache_headers(response, 'property_detail', row_etag(property_id, property_db1.version))
     return property_db1
 
+@property_router.get('/{property_id}/similar/', response_model=List[SimilarPropertySchema],
+                     summary='Get comparable properties', tags=['Property'])
+async def property_similar(property_id: int, k: int = Query(10, ge=1, le=PAGE_MAX_LIMIT),
+                           db: AsyncSession = Depends(get_db)):
+    target = (await db.execute(select(*SIMILAR_COLUMNS).where(Property.id == property_id))).first()
+    if target is None:
+        raise HTTPException(detail='No property by this id.', status_code=404)
+    if not similar_index.ready:
+        raise HTTPException(detail='Similar listings index is not built yet.', status_code=503)
+    neighbours = similar_index.query(raw_features(target), k, exclude=property_id)
+    rows = await db.execute(select(*EXPORT_COLUMNS).where(Property.id.in_([id_ for id_, _ in neighbours])))
+    properties = {row.id: row._mapping for row in rows}
+    return [{**properties[id_], 'distance': distance} for id_, distance in neighbours if id_ in properties]
+
 @property_router.put('/{property_id}/', response_model=dict, summary='Change property', tags=['Property'])
-async def property_update(property_id: int, property: PropertyInputSchema, db: Session = Depends(get_db)):
-    property_db2 = db.query(Property).filter(Property.id == property_id).first()
+async def property_update(property_id: int, property: PropertyInputSchema, db: AsyncSession = Depends(get_db)):
+    property_db2 = await db.scalar(select(Property).where(Property.id == property_id))
     if not property_db2:
         raise HTTPException(detail='No property by this id.', status_code=404)
     for key, value in property.model_dump().items():
         setattr(property_db2, key, value)
-    db.commit()
-    db.refresh(property_db2)
+    await db.commit()
+    await db.refresh(property_db2)
     return {'detail': 'Property has been changed.'}
 
 @property_router.delete('/{property_id}/', response_model=dict, summary='Delete property', tags=['Property'])
-async def property_delete(property_id: int, db: Session = Depends(get_db)):
-    property_db3 = db.query(Property).filter(Property.id == property_id).first()
+async def property_delete(property_id: int, db: AsyncSession = Depends(get_db)):
+    property_db3 = await db.scalar(select(Property).where(Property.id == property_id))
     if not property_db3:
         raise HTTPException(detail='No property by this id.', status_code=404)
-    db.delete(property_db3)
-    db.commit()
+    await db.delete(property_db3)
+    await db.commit()
     return {'detail': 'Property has been deleted.'}
\ No newline at end of file
@@ -0,0 +1,90 @@
+import asyncio
+import bisect
+import logging
+import time
+from typing import Dict, List, Optional
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+from fast_house_kg.api.pagination import PageParams, decode_cursor, page
+from fast_house_kg.config import REFCACHE_CHECK_INTERVAL
+from fast_house_kg.database.db import SessionLocal, dialect_insert
+from fast_house_kg.database.models import City, District, ReferenceVersion
+
+logger = logging.getLogger(__name__)
+
+class ReferenceCache:
+    def __init__(self, model, columns: List[str]):
+        self.model = model
+        self.name = model.__tablename__
+        self.columns = columns
+        self.rows: Dict[int, dict] = {}
+        self.ids: List[int] = []
+        self.version: Optional[int] = None
+        self.checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _db_version(self, db: AsyncSession) -> int:
+        return await db.scalar(select(ReferenceVersion.version).where(ReferenceVersion.name == self.name)) or 0
+
+    async def load(self, db: AsyncSession):
+        version = await self._db_version(db)
+        result = await db.execute(select(*(getattr(self.model, name) for name in self.columns)))
+        rows = {row.id: dict(row._mapping) for row in result}
+        self.rows, self.ids, self.version = rows, sorted(rows), version
+        self.checked_at = time.monotonic()
+
+    async def ensure_fresh(self, db: AsyncSession):
+        if self.version is not None and time.monotonic() - self.checked_at < REFCACHE_CHECK_INTERVAL:
+            return
+        async with self._lock:
+            if self.version is not None and time.monotonic() - self.checked_at < REFCACHE_CHECK_INTERVAL:
+                return
+            if self.version is not None and await self._db_version(db) == self.version:
+                self.checked_at = time.monotonic()
+                return
+            await self.load(db)
+
+    async def warm(self):
+        try:
+            async with SessionLocal() as db:
+                await self.load(db)
+        except Exception:
+            logger.exception('Could not preload %s reference data.', self.name)
+
+    def expire(self):
+        self.version = None
+
+    def get(self, row_id: int) -> Optional[dict]:
+        return self.rows.get(row_id)
+
+    def page(self, params: PageParams) -> dict:
+        start = 0
+        if params.after is not None:
+            after, = decode_cursor(params.after, [self.model.id])
+            start = bisect.bisect_right(self.ids, after)
+        ids = self.ids[start:start + params.limit + 1]
+        return page([self.rows[row_id] for row_id in ids], [self.model.id], params)
+
+city_cache = ReferenceCache(City, ['id', 'city_name'])
+district_cache = ReferenceCache(District, ['id', 'district_name'])
+reference_caches = {cache.name: cache for cache in (city_cache, district_cache)}
+
+def _bump_version(mapper, connection, target):
+    name = mapper.local_table.name
+    insert = dialect_insert(connection.dialect.name)
+    stmt = insert(ReferenceVersion).values(name=name, version=1)
+    connection.execute(stmt.on_conflict_do_update(index_elements=[ReferenceVersion.name],
+                                                  set_={'version': ReferenceVersion.version + 1}))
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('reference_dirty', set()).add(name)
+
+for _cache in reference_caches.values():
+    for _event in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_cache.model, _event, _bump_version)
+
+@event.listens_for(Session, 'after_commit')
+def _expire_reference_caches(session):
+    for name in session.info.pop('reference_dirty', ()):
+        reference_caches[name].expire()
@@ -1,57 +1,67 @@
-from fast_house_kg.database.schema import ReviewOutSchema, ReviewInputSchema
+from fast_house_kg.database.schema import ReviewOutSchema, ReviewInputSchema, PageSchema
 from fast_house_kg.database.models import Review
-from fastapi import HTTPException, Depends, APIRouter
-from sqlalchemy.orm import Session
-from typing import List
-from fast_house_kg.database.db import SessionLocal
+from fastapi import HTTPException, Depends, APIRouter, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fast_house_kg.database.db import get_db
+from fast_house_kg.api.pagination import PageParams, paginate_rows, keyset
+from fast_house_kg.api.conditional import row_etag, page_etag, not_modified, set_cache_headers, cache_headers
+from fast_house_kg.api.serialization import FastJSON, schema_columns
 
 review_router = APIRouter(prefix='/review')
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+REVIEW_COLUMNS = schema_columns(Review, ReviewOutSchema)
+review_page_json = FastJSON(PageSchema[ReviewOutSchema])
 
 @review_router.post('/', response_model=ReviewOutSchema, tags=['Review'], summary='Create review')
-async def create_review(review: ReviewInputSchema, db: Session = Depends(get_db)):
-    review_db = Review(**review.dict())
+async def create_review(review: ReviewInputSchema, db: AsyncSession = Depends(get_db)):
+    review_db = Review(**review.model_dump())
     db.add(review_db)
-    db.commit()
-    db.refresh(review_db)
+    await db.commit()
+    await db.refresh(review_db)
     return review_db
 
-@review_router.get('/', response_model=List[ReviewOutSchema], summary='Get all reviews', tags=['Review'])
-async def reviews_list(db: Session = Depends(get_db)):
-    reviews_db = db.query(Review).all()
-    if not reviews_db:
+@review_router.get('/', response_model=PageSchema[ReviewOutSchema], summary='Get all reviews', tags=['Review'])
+async def reviews_list(request: Request, params: PageParams = Depends(), db: AsyncSession = Depends(get_db)):
+    versions = (await db.execute(keyset(select(Review.id, Review.version), [Review.id], params))).all()
+    etag = page_etag(versions, f'{params.limit}:{params.after}')
+    if cached := not_modified(request, 'reviews_list', etag):
+        return cached
+    reviews_db = await paginate_rows(db, select(*REVIEW_COLUMNS), [Review.id], params)
+    if not reviews_db['items'] and params.after is None:
         raise HTTPException(detail='No reviews.', status_code=404)
-    return reviews_db
+    return review_page_json.response(reviews_db, cache_headers('reviews_list', etag))
 
 @review_router.get('/{review_id}/', response_model=ReviewOutSchema, summary='Get review by id', tags=['Review'])
-async def review_detail(review_id: int, db: Session = Depends(get_db)):
-    review_db1 = db.query(Review).filter(Review.id == review_id).first()
+async def review_detail(review_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    version = await db.scalar(select(Review.version).where(Review.id == review_id))
+    if version is None:
+        raise HTTPException(detail='No review by this id.', status_code=404)
+    etag = row_etag(review_id, version)
+    if cached := not_modified(request, 'review_detail', etag):
+        return cached
+    review_db1 = await db.scalar(select(Review).where(Review.id == review_id))
     if not review_db1:
         raise HTTPException(detail='No review by this id.', status_code=404)
+    set_cache_headers(response, 'review_detail', row_etag(review_id, review_db1.version))
     return review_db1
 
 @review_router.put('/{review_id}/', response_model=dict, summary='Change review', tags=['Review'])
-async def review_update(review_id: int, review: ReviewInputSchema, db: Session = Depends(get_db)):
-    review_db2 = db.query(Review).filter(Review.id == review_id).first()
+async def review_update(review_id: int, review: ReviewInputSchema, db: AsyncSession = Depends(get_db)):
+    review_db2 = await db.scalar(select(Review).where(Review.id == review_id))
     if not review_db2:
         raise HTTPException(detail='No review by this id.', status_code=404)
     for key, value in review.model_dump().items():
         setattr(review_db2, key, value)
-    db.commit()
-    db.refresh(review_db2)
+    await db.commit()
+    await db.refresh(review_db2)
     return {'detail': 'Review has been changed.'}
 
 @review_router.delete('/{review_id}/', response_model=dict, summary='Delete review', tags=['Review'])
-async def review_delete(review_id: int, db: Session = Depends(get_db)):
-    review_db3 = db.query(Review).filter(Review.id == review_id).first()
+async def review_delete(review_id: int, db: AsyncSession = Depends(get_db)):
+    review_db3 = await db.scalar(select(Review).where(Review.id == review_id))
     if not review_db3:
         raise HTTPException(detail='No review by this id.', status_code=404)
-    db.delete(review_db3)
-    db.commit()
+    await db.delete(review_db3)
+    await db.commit()
     return {'detail': 'Review has been deleted.'}
\ No newline at end of file
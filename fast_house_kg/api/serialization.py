@@ -0,0 +1,22 @@
+from typing import Optional
+import orjson
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+from fast_house_kg.config import SERIALIZATION_MODE
+
+def schema_columns(model, schema: type[BaseModel]) -> list:
+    return [getattr(model, name) for name in schema.model_fields]
+
+class FastJSON:
+    """Encodes plain dicts/rows for one response shape without FastAPI's ORM validate + jsonable_encoder passes."""
+
+    def __init__(self, response_type):
+        self.adapter = TypeAdapter(response_type)
+
+    def render(self, content) -> bytes:
+        if SERIALIZATION_MODE == 'trusted':
+            return orjson.dumps(content)
+        return self.adapter.dump_json(self.adapter.validate_python(content))
+
+    def response(self, content, headers: Optional[dict] = None) -> Response:
+        return Response(self.render(content), media_type='application/json', headers=headers)
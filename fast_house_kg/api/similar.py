@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+from fast_house_kg.config import SIMILAR_REBUILD_INTERVAL, SIMILAR_MAX_DELTA, SIMILAR_FETCH_CHUNK_SIZE
+from fast_house_kg.database.db import SessionLocal
+from fast_house_kg.database.models import Property, RegionChoices
+from fast_house_kg.metrics import Gauge
+
+if TYPE_CHECKING:
+    from scipy.spatial import cKDTree
+
+logger = logging.getLogger(__name__)
+
+SIMILAR_FEATURES = ('price', 'area', 'rooms', 'floor', 'region', 'district_id')
+SIMILAR_COLUMNS = (Property.id, *(getattr(Property, name) for name in SIMILAR_FEATURES))
+REGION_INDEX = {region: i for i, region in enumerate(RegionChoices)}
+# One standard deviation of a numeric feature weighs 1; another region costs ~1.4, another district 0.5.
+REGION_WEIGHT = 1.0
+DISTRICT_PENALTY = 0.5
+# The tree is over-queried by this factor so re-ranking by district still has enough candidates;
+# rounds double the query size until that many live (not tombstoned) rows are found.
+CANDIDATES = 4
+
+def raw_features(row) -> tuple:
+    return tuple(getattr(row, name) for name in SIMILAR_FEATURES)
+
+def _numeric(raw: List[tuple]) -> np.ndarray:
+    numeric = np.array([features[:4] for features in raw], dtype=float).reshape(-1, 4)
+    numeric[:, 0] = np.log1p(np.maximum(numeric[:, 0], 0))
+    return numeric
+
+class SimilarityIndex:
+    """KD-tree snapshot plus a brute-force delta of rows written since it was built.
+
+    Updated rows are tombstoned in the tree and live in the delta until the next rebuild.
+    """
+
+    def __init__(self):
+        self.tree: Optional['cKDTree'] = None
+        self.ids = np.empty(0, dtype=np.int64)
+        self.districts = np.empty(0, dtype=np.int64)
+        self.mean: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+        self.delta: Dict[int, tuple] = {}
+        self.tombstones: set = set()
+        self.built_at = 0.0
+        self.build_seconds = 0.0
+        self._delta_arrays = None
+        self._replay: Optional[list] = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.mean is not None
+
+    def _encode(self, raw: List[tuple], mean: np.ndarray, scale: np.ndarray) -> np.ndarray:
+        regions = np.zeros((len(raw), len(REGION_INDEX)))
+        for i, features in enumerate(raw):
+            regions[i, REGION_INDEX[features[4]]] = REGION_WEIGHT
+        return np.hstack(((_numeric(raw) - mean) / scale, regions))
+
+    def build(self, rows):
+        # scipy is slow to import; the first build runs off the request path, after startup.
+        from scipy.spatial import cKDTree
+        start = time.perf_counter()
+        raw = [raw_features(row) for row in rows]
+        numeric = _numeric(raw)
+        mean = numeric.mean(axis=0) if raw else np.zeros(4)
+        scale = numeric.std(axis=0) if raw else np.ones(4)
+        scale[scale == 0] = 1
+        tree = cKDTree(self._encode(raw, mean, scale)) if raw else None
+        ids = np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows))
+        districts = np.fromiter((features[5] for features in raw), dtype=np.int64, count=len(raw))
+        with self._lock:
+            self.tree, self.ids, self.districts, self.mean, self.scale = tree, ids, districts, mean, scale
+            self.delta, self.tombstones, self._delta_arrays = {}, set(), None
+            replay, self._replay = self._replay or [], None
+            self.built_at = time.monotonic()
+            self.build_seconds = time.perf_counter() - start
+        # Writes committed while the snapshot was being read may be missing from it.
+        self.apply(replay)
+
+    async def rebuild(self):
+        with self._lock:
+            self._replay = []
+        try:
+            rows = []
+            async with SessionLocal() as db:
+                # Streamed in chunks so one large fetch doesn't hold up the event loop; build runs on a thread.
+                result = await db.stream(select(*SIMILAR_COLUMNS).execution_options(yield_per=SIMILAR_FETCH_CHUNK_SIZE))
+                async for partition in result.partitions():
+                    rows.extend(partition)
+            await asyncio.to_thread(self.build, rows)
+        finally:
+            with self._lock:
+                self._replay = None
+
+    def apply(self, changes: List[Tuple[int, Optional[tuple]]]):
+        with self._lock:
+            if self._replay is not None:
+                self._replay.extend(changes)
+            if not self.ready:
+                return
+            for property_id, raw in changes:
+                self.tombstones.add(property_id)
+                if raw is None:
+                    self.delta.pop(property_id, None)
+                else:
+                    self.delta[property_id] = raw
+            self._delta_arrays = None
+
+    def stale(self) -> bool:
+        return (not self.ready or time.monotonic() - self.built_at >= SIMILAR_REBUILD_INTERVAL
+                or len(self.tombstones) >= SIMILAR_MAX_DELTA)
+
+    def query(self, raw: tuple, k: int, exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+        with self._lock:
+            tree, ids, districts, tombstones = self.tree, self.ids, self.districts, self.tombstones
+            mean, scale = self.mean, self.scale
+            if self._delta_arrays is None and self.delta:
+                delta = list(self.delta.items())
+                self._delta_arrays = (
+                    np.fromiter((property_id for property_id, _ in delta), dtype=np.int64, count=len(delta)),
+                    self._encode([features for _, features in delta], mean, scale),
+                    np.fromiter((features[5] for _, features in delta), dtype=np.int64, count=len(delta)),
+                )
+            delta_arrays = self._delta_arrays if self.delta else None
+        vector = self._encode([raw], mean, scale)[0]
+        district = raw[5]
+        candidates = {}
+        if tree is not None:
+            wanted = (k + 1) * CANDIDATES
+            count = min(len(ids), wanted)
+            while True:
+                distances, indexes = tree.query(vector, count)
+                live = {}
+                for distance, i in zip(np.atleast_1d(distances), np.atleast_1d(indexes)):
+                    property_id = int(ids[i])
+                    if property_id not in tombstones:
+                        live[property_id] = distance + DISTRICT_PENALTY * (districts[i] != district)
+                if len(live) >= wanted or count == len(ids):
+                    break
+                count = min(len(ids), count * 2)
+            candidates.update(live)
+        if delta_arrays is not None:
+            delta_ids, vectors, delta_districts = delta_arrays
+            distances = np.linalg.norm(vectors - vector, axis=1) + DISTRICT_PENALTY * (delta_districts != district)
+            candidates.update(zip(delta_ids.tolist(), distances))
+        candidates.pop(exclude, None)
+        return [(property_id, float(distance)) for property_id, distance
+                in sorted(candidates.items(), key=lambda item: item[1])[:k]]
+
+    def stats(self) -> dict:
+        return {
+            'size': len(self.ids),
+            'delta': len(self.delta),
+            'tombstones': len(self.tombstones),
+            'build_seconds': round(self.build_seconds, 4),
+            'age_seconds': round(time.monotonic() - self.built_at, 1) if self.ready else None,
+        }
+
+similar_index = SimilarityIndex()
+
+Gauge('similar_index_rows', 'Rows in the similar-listings index by part.', ('part',), function=lambda: {
+    (name,): value for name, value in similar_index.stats().items() if name in ('size', 'delta', 'tombstones')
+})
+
+async def refresh_similarity_index():
+    while True:
+        if similar_index.stale():
+            try:
+                await similar_index.rebuild()
+            except Exception:
+                logger.exception('Similarity index rebuild failed.')
+        await asyncio.sleep(min(SIMILAR_REBUILD_INTERVAL, 10))
+
+def _pending_changes(target) -> list:
+    return pending_changes(object_session(target))
+
+def pending_changes(session: Session) -> list:
+    """(id, raw features or None) pairs the session's commit applies to the index; writes made with Core
+    statements, which skip the mapper events below, append theirs here."""
+    return session.info.setdefault('similar_changes', [])
+
+@event.listens_for(Property, 'after_insert')
+@event.listens_for(Property, 'after_update')
+def _property_saved(mapper, connection, target):
+    _pending_changes(target).append((target.id, raw_features(target)))
+
+@event.listens_for(Property, 'after_delete')
+def _property_deleted(mapper, connection, target):
+    _pending_changes(target).append((target.id, None))
+
+@event.listens_for(Session, 'after_commit')
+def _apply_similar_changes(session):
+    changes = session.info.pop('similar_changes', None)
+    if changes:
+        similar_index.apply(changes)
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_similar_changes(session):
+    session.info.pop('similar_changes', None)
@@ -0,0 +1,92 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fast_house_kg.config import (REFRESH_CACHE_TTL, REFRESH_CACHE_SIZE, REFRESH_REVOCATION_CHECK_INTERVAL,
+                                  TOKEN_SWEEP_INTERVAL, TOKEN_SWEEP_BATCH)
+from fast_house_kg.database.db import SessionLocal, dialect_insert
+from fast_house_kg.database.models import ReferenceVersion, UserProfileRefreshToken
+
+logger = logging.getLogger(__name__)
+
+REVOKED = object()
+# Counts logouts in reference_version, so every worker learns that some cached token may have been revoked.
+REVOCATIONS = 'refresh_token_revocations'
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def revocation_stmt(dialect: str):
+    insert = dialect_insert(dialect)
+    stmt = insert(ReferenceVersion).values(name=REVOCATIONS, version=1)
+    return stmt.on_conflict_do_update(index_elements=[ReferenceVersion.name],
+                                      set_={'version': ReferenceVersion.version + 1})
+
+class TokenCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self.revocations: Optional[int] = None
+        self.checked_at = 0.0
+
+    async def ensure_fresh(self, db: AsyncSession):
+        """Drops every cached token once a logout in any worker bumped the revocation count."""
+        if time.monotonic() - self.checked_at < REFRESH_REVOCATION_CHECK_INTERVAL:
+            return
+        revocations = await db.scalar(select(ReferenceVersion.version).where(ReferenceVersion.name == REVOCATIONS)) or 0
+        if revocations != self.revocations:
+            self._entries.clear()
+            self.revocations = revocations
+        self.checked_at = time.monotonic()
+
+    def get(self, token_hash: str):
+        entry = self._entries.get(token_hash)
+        if entry is None:
+            return None
+        value, cached_until = entry
+        if cached_until <= time.monotonic():
+            del self._entries[token_hash]
+            return None
+        self._entries.move_to_end(token_hash)
+        return value
+
+    def set(self, token_hash: str, value):
+        self._entries[token_hash] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(token_hash)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def revoke(self, token_hash: str):
+        self.set(token_hash, REVOKED)
+
+token_cache = TokenCache(REFRESH_CACHE_SIZE, REFRESH_CACHE_TTL)
+
+async def delete_expired_tokens(now: Optional[datetime] = None) -> int:
+    now = now or datetime.utcnow()
+    deleted = 0
+    while True:
+        async with SessionLocal() as db:
+            expired = (select(UserProfileRefreshToken.id).where(UserProfileRefreshToken.expires_at < now)
+                       .limit(TOKEN_SWEEP_BATCH))
+            result = await db.execute(delete(UserProfileRefreshToken)
+                                      .where(UserProfileRefreshToken.id.in_(expired.scalar_subquery())))
+            await db.commit()
+        deleted += result.rowcount
+        if result.rowcount < TOKEN_SWEEP_BATCH:
+            return deleted
+
+async def sweep_expired_tokens():
+    while True:
+        try:
+            deleted = await delete_expired_tokens()
+            if deleted:
+                logger.info('Deleted %s expired refresh tokens.', deleted)
+        except Exception:
+            logger.exception('Refresh token sweep failed.')
+        await asyncio.sleep(TOKEN_SWEEP_INTERVAL)
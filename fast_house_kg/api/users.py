@@ -1,57 +1,76 @@
-from fast_house_kg.database.schema import UserProfileInputSchema, UserProfileOutSchema
-from fast_house_kg.database.models import UserProfile
+from fast_house_kg.database.schema import UserProfileInputSchema, UserProfileOutSchema, PageSchema, SellerReputationOutSchema
+from fast_house_kg.database.models import UserProfile, SellerReputation, SellerRatingCount
 from fastapi import HTTPException, Depends, APIRouter
-from sqlalchemy.orm import Session
-from typing import List
-from fast_house_kg.database.db import SessionLocal
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fast_house_kg.database.db import get_db
+from fast_house_kg.api.pagination import PageParams, paginate_rows
+from fast_house_kg.api.serialization import FastJSON, schema_columns
 
 users_router = APIRouter(prefix='/users')
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+USER_COLUMNS = schema_columns(UserProfile, UserProfileOutSchema)
+user_page_json = FastJSON(PageSchema[UserProfileOutSchema])
 
 @users_router.post('/', response_model=UserProfileOutSchema, tags=['Users'], summary='Create user')
-async def create_user(user: UserProfileInputSchema, db: Session = Depends(get_db)):
-    user_db = UserProfile(**user.dict())
+async def create_user(user: UserProfileInputSchema, db: AsyncSession = Depends(get_db)):
+    user_db = UserProfile(**user.model_dump())
     db.add(user_db)
-    db.commit()
-    db.refresh(user_db)
+    await db.commit()
+    await db.refresh(user_db)
     return user_db
 
-@users_router.get('/', response_model=List[UserProfileOutSchema], summary='Get all users', tags=['Users'])
-async def users_list(db: Session = Depends(get_db)):
-    users_db = db.query(UserProfile).all()
-    if not users_db:
+@users_router.get('/', response_model=PageSchema[UserProfileOutSchema], summary='Get all users', tags=['Users'])
+async def users_list(params: PageParams = Depends(), db: AsyncSession = Depends(get_db)):
+    users_db = await paginate_rows(db, select(*USER_COLUMNS), [UserProfile.id], params)
+    if not users_db['items'] and params.after is None:
         raise HTTPException(detail='No users.', status_code=404)
-    return users_db
+    return user_page_json.response(users_db)
 
 @users_router.get('/{user_id}/', response_model=UserProfileOutSchema, summary='Get user by id.', tags=['Users'])
-async def user_detail(user_id: int, db: Session = Depends(get_db)):
-    user_db1 = db.query(UserProfile).filter(UserProfile.id==user_id).first()
+async def user_detail(user_id: int, db: AsyncSession = Depends(get_db)):
+    user_db1 = await db.scalar(select(UserProfile).where(UserProfile.id==user_id))
     if not user_db1:
         raise HTTPException(detail='No user by this id.', status_code=404)
     return user_db1
 
+@users_router.get('/{user_id}/reputation/', response_model=SellerReputationOutSchema, summary='Get seller reputation.',
+                  tags=['Users'])
+async def user_reputation(user_id: int, db: AsyncSession = Depends(get_db)):
+    reputation_db = await db.get(SellerReputation, user_id)
+    if not reputation_db:
+        if not await db.get(UserProfile, user_id):
+            raise HTTPException(detail='No user by this id.', status_code=404)
+        return {'seller_id': user_id, 'rating_count': 0, 'rating_sum': 0, 'average': None, 'histogram': {}}
+    histogram = (await db.execute(
+        select(SellerRatingCount.rating, SellerRatingCount.count)
+        .where(SellerRatingCount.seller_id == user_id, SellerRatingCount.count > 0)
+        .order_by(SellerRatingCount.rating)
+    )).all()
+    return {
+        'seller_id': user_id,
+        'rating_count': reputation_db.rating_count,
+        'rating_sum': reputation_db.rating_sum,
+        'average': reputation_db.rating_sum / reputation_db.rating_count if reputation_db.rating_count else None,
+        'histogram': dict(histogram),
+    }
+
 @users_router.put('/{user_id}/', response_model=dict, summary='Change user.', tags=['Users'])
-async def user_update(user_id: int, user: UserProfileInputSchema, db: Session = Depends(get_db)):
-    user_db2 = db.query(UserProfile).filter(UserProfile.id==user_id).first()
+async def user_update(user_id: int, user: UserProfileInputSchema, db: AsyncSession = Depends(get_db)):
+    user_db2 = await db.scalar(select(UserProfile).where(UserProfile.id==user_id))
     if not user_db2:
         raise HTTPException(detail='No user by this id.', status_code=404)
     for key, value in user.model_dump().items():
         setattr(user_db2, key, value)
-    db.commit()
-    db.refresh(user_db2)
+    await db.commit()
+    await db.refresh(user_db2)
     return {'detail': 'User has been changed.'}
 
 @users_router.delete('/{user_id}/', response_model=dict, summary='Delete user.', tags=['Users'])
-async def user_delete(user_id: int, db: Session = Depends(get_db)):
-    user_db3 = db.query(UserProfile).filter(UserProfile.id==user_id).first()
+async def user_delete(user_id: int, db: AsyncSession = Depends(get_db)):
+    user_db3 = await db.scalar(select(UserProfile).where(UserProfile.id==user_id))
     if not user_db3:
         raise HTTPException(detail='No user by this id.', status_code=404)
-    db.delete(user_db3)
-    db.commit()
+    await db.delete(user_db3)
+    await db.commit()
     return {'detail': 'User has been deleted.'}
\ No newline at end of file
@@ -0,0 +1,34 @@
+import json
+from fastapi import HTTPException, Request
+
+NDJSON_MEDIA_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonlines')
+
+async def iter_json_rows(request: Request):
+    content_type = request.headers.get('content-type', '').split(';')[0].strip()
+    if content_type in NDJSON_MEDIA_TYPES:
+        buffer = b''
+        line_number = 0
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b'\n')
+            for line in lines:
+                line_number += 1
+                if line.strip():
+                    yield _load_line(line, line_number)
+        if buffer.strip():
+            yield _load_line(buffer, line_number + 1)
+        return
+    try:
+        rows = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(detail='Invalid JSON.', status_code=400)
+    if not isinstance(rows, list):
+        raise HTTPException(detail='Expected a JSON array.', status_code=400)
+    for row in rows:
+        yield row
+
+def _load_line(line: bytes, line_number: int):
+    try:
+        return json.loads(line)
+    except ValueError:
+        raise HTTPException(detail=f'Invalid JSON on line {line_number}.', status_code=400)
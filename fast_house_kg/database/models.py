@@ -1,9 +1,10 @@
-from .db import Base
-from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, ForeignKey, Date, Text, Enum
-from typing import List
+from .db import Base, dialect_insert
+from sqlalchemy.orm import Mapped, mapped_column, object_session, relationship
+from sqlalchemy import (event, inspect, Integer, BigInteger, Float, String, ForeignKey, Date, DateTime, Text, Enum, Index,
+                        UniqueConstraint, JSON, DDL)
+from typing import List, Optional
 from enum import Enum as PyEnum
-from datetime import date
+from datetime import date, datetime
 
 class StatusChoices(str, PyEnum):
     seller = 'Seller'
@@ -34,6 +35,10 @@ class ConditionChoices(str, PyEnum):
     middle = 'Middle'
     not_finished = 'Not finished'
 
+class MediaKindChoices(str, PyEnum):
+    image = 'Image'
+    document = 'Document'
+
 class UserProfile(Base):
     __tablename__ = 'user_profile'
     id: Mapped[int] = mapped_column(Integer, autoincrement=True, primary_key=True)
@@ -58,9 +63,10 @@ class UserProfileRefreshToken(Base):
     __tablename__ = 'refresh_token'
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey('user_profile.id'))
-    token: Mapped[str] = mapped_column(String)
+    user_id: Mapped[int] = mapped_column(ForeignKey('user_profile.id'), index=True)
+    token_hash: Mapped[str] = mapped_column(String(64), unique=True)
     created_date: Mapped[date] = mapped_column(Date, default=date.today())
+    expires_at: Mapped[datetime] = mapped_column(DateTime, index=True)
 
     token_user: Mapped[UserProfile] = relationship(back_populates='users_token')
 
@@ -73,6 +79,11 @@ class City(Base):
     city_property: Mapped[List['Property']] = relationship(back_populates='city',
                                                            cascade='all, delete-orphan')
 
+class ReferenceVersion(Base):
+    __tablename__ = 'reference_version'
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0)
+
 class District(Base):
     __tablename__ = 'district'
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
@@ -83,6 +94,19 @@ class District(Base):
 
 class Property(Base):
     __tablename__ = 'property'
+    __table_args__ = (
+        Index('ix_property_region_type_price', 'region', 'property_type', 'price'),
+        Index('ix_property_city_district_price', 'city_id', 'district_id', 'price'),
+        Index('ix_property_district_rooms_price', 'district_id', 'rooms', 'price'),
+        Index('ix_property_type_rooms_price', 'property_type', 'rooms', 'price'),
+        Index('ix_property_price_id', 'price', 'id'),
+        Index('ix_property_area_id', 'area', 'id'),
+        Index('ix_property_rooms_id', 'rooms', 'id'),
+        Index('ix_property_floor_id', 'floor', 'id'),
+        Index('ix_property_created_date_id', 'created_date', 'id'),
+        Index('ix_property_seller_id', 'seller_id'),
+        UniqueConstraint('seller_id', 'external_id', name='uq_property_seller_external_id'),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     title: Mapped[str] = mapped_column(String)
     description: Mapped[str] = mapped_column(Text)
@@ -100,12 +124,32 @@ class Property(Base):
     images: Mapped[str] = mapped_column(String)
     documents: Mapped[str] = mapped_column(String)
     seller_id: Mapped[int] = mapped_column(ForeignKey('user_profile.id'))
+    external_id: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     created_date: Mapped[date] = mapped_column(Date, default=date.today())
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version: Mapped[int] = mapped_column(Integer, server_default='1')
+    estimated_price: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    model_version: Mapped[Optional[str]] = mapped_column(String, nullable=True, index=True)
 
     city: Mapped[City] = relationship(back_populates='city_property')
     district: Mapped[District] = relationship(back_populates='district_property')
     seller: Mapped[UserProfile] = relationship(back_populates='seller_property')
 
+class PropertyMedia(Base):
+    __tablename__ = 'property_media'
+    __table_args__ = (UniqueConstraint('property_id', 'sha256', name='uq_property_media_property_sha256'),)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    property_id: Mapped[int] = mapped_column(ForeignKey('property.id', ondelete='CASCADE'), index=True)
+    kind: Mapped[MediaKindChoices] = mapped_column(Enum(MediaKindChoices))
+    sha256: Mapped[str] = mapped_column(String(64), index=True)
+    content_type: Mapped[str] = mapped_column(String)
+    size: Mapped[int] = mapped_column(BigInteger)
+    filename: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    width: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    height: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    variants: Mapped[List[int]] = mapped_column(JSON, default=list)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
 class Review(Base):
     __tablename__ = 'review'
     id: Mapped[int] = mapped_column(Integer, autoincrement=True, primary_key=True)
@@ -114,6 +158,158 @@ class Review(Base):
     rating: Mapped[int] = mapped_column(Integer)
     comment: Mapped[str] = mapped_column(Text)
     created_date: Mapped[date] = mapped_column(Date, default=date.today())
+    version: Mapped[int] = mapped_column(Integer, server_default='1')
 
     buyer: Mapped[UserProfile] = relationship(back_populates='review_buyer', foreign_keys=[buyer_id])
-    seller: Mapped[UserProfile] = relationship(back_populates='review_seller', foreign_keys=[seller_id])
\ No newline at end of file
+    seller: Mapped[UserProfile] = relationship(back_populates='review_seller', foreign_keys=[seller_id])
+
+def _bump_version(mapper, connection, target):
+    # The version only feeds ETags. It is bumped in SQL, like the bulk upsert and re-valuation do, so
+    # concurrent writers each produce a new version instead of the ORM failing on a version mismatch.
+    if object_session(target).is_modified(target, include_collections=False):
+        target.version = mapper.local_table.c.version + 1
+
+event.listen(Property, 'before_update', _bump_version)
+event.listen(Review, 'before_update', _bump_version)
+
+class SellerReputation(Base):
+    __tablename__ = 'seller_reputation'
+    seller_id: Mapped[int] = mapped_column(ForeignKey('user_profile.id', ondelete='CASCADE'), primary_key=True)
+    rating_count: Mapped[int] = mapped_column(Integer, default=0)
+    rating_sum: Mapped[int] = mapped_column(Integer, default=0)
+
+class SellerRatingCount(Base):
+    __tablename__ = 'seller_rating_count'
+    seller_id: Mapped[int] = mapped_column(ForeignKey('user_profile.id', ondelete='CASCADE'), primary_key=True)
+    rating: Mapped[int] = mapped_column(Integer, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+
+def _apply_rating(connection, seller_id: int, rating: int, delta: int):
+    insert = dialect_insert(connection.dialect.name)
+    stmt = insert(SellerReputation).values(seller_id=seller_id, rating_count=delta, rating_sum=delta * rating)
+    connection.execute(stmt.on_conflict_do_update(
+        index_elements=[SellerReputation.seller_id],
+        set_={'rating_count': SellerReputation.rating_count + delta,
+              'rating_sum': SellerReputation.rating_sum + delta * rating},
+    ))
+    stmt = insert(SellerRatingCount).values(seller_id=seller_id, rating=rating, count=delta)
+    connection.execute(stmt.on_conflict_do_update(
+        index_elements=[SellerRatingCount.seller_id, SellerRatingCount.rating],
+        set_={'count': SellerRatingCount.count + delta},
+    ))
+
+@event.listens_for(Review, 'after_insert')
+def _review_inserted(mapper, connection, target):
+    _apply_rating(connection, target.seller_id, target.rating, 1)
+
+@event.listens_for(Review, 'after_update')
+def _review_updated(mapper, connection, target):
+    state = inspect(target)
+    seller_history = state.attrs.seller_id.history
+    rating_history = state.attrs.rating.history
+    if not seller_history.deleted and not rating_history.deleted:
+        return
+    old_seller = seller_history.deleted[0] if seller_history.deleted else target.seller_id
+    old_rating = rating_history.deleted[0] if rating_history.deleted else target.rating
+    _apply_rating(connection, old_seller, old_rating, -1)
+    _apply_rating(connection, target.seller_id, target.rating, 1)
+
+@event.listens_for(Review, 'after_delete')
+def _review_deleted(mapper, connection, target):
+    _apply_rating(connection, target.seller_id, target.rating, -1)
+
+ROLLUP_KEYS = ('region', 'city_id', 'district_id', 'property_type', 'rooms')
+
+class PriceRollup(Base):
+    __tablename__ = 'price_rollup'
+    region: Mapped[RegionChoices] = mapped_column(Enum(RegionChoices), primary_key=True)
+    city_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    district_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    property_type: Mapped[PropertyChoices] = mapped_column(Enum(PropertyChoices), primary_key=True)
+    rooms: Mapped[int] = mapped_column(Integer, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer)
+    price_sum: Mapped[int] = mapped_column(BigInteger)
+    price_histogram: Mapped[dict] = mapped_column(JSON)
+    area_count: Mapped[int] = mapped_column(Integer)
+    price_per_m2_sum: Mapped[float] = mapped_column(Float)
+    price_per_m2_histogram: Mapped[dict] = mapped_column(JSON)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class PriceRollupDirty(Base):
+    __tablename__ = 'price_rollup_dirty'
+    region: Mapped[RegionChoices] = mapped_column(Enum(RegionChoices), primary_key=True)
+    city_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    district_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    property_type: Mapped[PropertyChoices] = mapped_column(Enum(PropertyChoices), primary_key=True)
+    rooms: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # Bumped every time the key is marked, so a refresh only clears marks it has seen.
+    sequence: Mapped[int] = mapped_column(Integer, server_default='1')
+
+def rollup_dirty_stmt(dialect: str, keys):
+    insert = dialect_insert(dialect)
+    return insert(PriceRollupDirty).values([dict(zip(ROLLUP_KEYS, key)) for key in keys]).on_conflict_do_update(
+        index_elements=[getattr(PriceRollupDirty, name) for name in ROLLUP_KEYS],
+        set_={'sequence': PriceRollupDirty.sequence + 1},
+    )
+
+def _rollup_key(target) -> tuple:
+    return tuple(getattr(target, name) for name in ROLLUP_KEYS)
+
+@event.listens_for(Property, 'after_insert')
+@event.listens_for(Property, 'after_delete')
+def _property_written(mapper, connection, target):
+    connection.execute(rollup_dirty_stmt(connection.dialect.name, [_rollup_key(target)]))
+
+@event.listens_for(Property, 'after_update')
+def _property_updated(mapper, connection, target):
+    state = inspect(target)
+    keys = {_rollup_key(target)}
+    old_key = tuple(state.attrs[name].history.deleted[0] if state.attrs[name].history.deleted else getattr(target, name)
+                    for name in ROLLUP_KEYS)
+    keys.add(old_key)
+    connection.execute(rollup_dirty_stmt(connection.dialect.name, keys))
+
+# Columns the estimated price is derived from; editing any of them makes the estimate stale.
+PROPERTY_FEATURE_COLUMNS = ('area', 'rooms', 'condition', 'property_type')
+
+@event.listens_for(Property, 'before_update')
+def _property_features_changed(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in PROPERTY_FEATURE_COLUMNS):
+        target.model_version = None
+
+# One row per running singleton job (re-valuation). The holder renews expires_at as it works,
+# so a lock left by a crashed process lapses instead of blocking every later run.
+class JobLock(Base):
+    __tablename__ = 'job_lock'
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    owner: Mapped[str] = mapped_column(String)
+    expires_at: Mapped[datetime] = mapped_column(DateTime)
+
+# Full-text search lives outside the mapped columns: a generated tsvector with a GIN index on Postgres,
+# an external-content FTS5 table kept in sync by triggers on SQLite.
+SEARCH_VECTOR = ("setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+                 "setweight(to_tsvector('simple', coalesce(description, '')), 'B')")
+SEARCH_DDL = {
+    'postgresql': [
+        f'ALTER TABLE property ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED',
+        'CREATE INDEX ix_property_search_vector ON property USING gin (search_vector)',
+    ],
+    'sqlite': [
+        "CREATE VIRTUAL TABLE property_fts USING fts5(title, description, content='property', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2')",
+        'CREATE TRIGGER property_fts_insert AFTER INSERT ON property BEGIN '
+        'INSERT INTO property_fts (rowid, title, description) VALUES (new.id, new.title, new.description); END',
+        'CREATE TRIGGER property_fts_delete AFTER DELETE ON property BEGIN '
+        "INSERT INTO property_fts (property_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); END",
+        'CREATE TRIGGER property_fts_update AFTER UPDATE OF title, description ON property BEGIN '
+        "INSERT INTO property_fts (property_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); "
+        'INSERT INTO property_fts (rowid, title, description) VALUES (new.id, new.title, new.description); END',
+    ],
+}
+
+for _dialect, _statements in SEARCH_DDL.items():
+    for _statement in _statements:
+        event.listen(Property.__table__, 'after_create', DDL(_statement).execute_if(dialect=_dialect))
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import logging
+import random
+import re
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+from sqlalchemy import event
+try:
+    import greenlet
+except ImportError:
+    greenlet = None
+from fast_house_kg.config import (BASE_DIR, QUERY_PROFILER_SAMPLE_RATE, QUERY_PROFILER_SLOW_MS,
+                                  QUERY_PROFILER_REPEAT_THRESHOLD, QUERY_PROFILER_REPORT)
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = r'(?:\?|%\(\w+\)s|%s|\$\d+|:\w+)'
+_IN_LIST = re.compile(r'\(\s*' + _PLACEHOLDER + r'(?:\s*,\s*' + _PLACEHOLDER + r')*\s*\)')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACE = re.compile(r'\s+')
+_PROJECT = str(BASE_DIR)
+
+def normalize(statement: str) -> str:
+    statement = _STRING.sub('?', statement)
+    # Collapse placeholder lists before numbers are replaced, which would turn $1 into an unmatched $?;
+    # then again for lists of literals, which only become placeholders once numbers are replaced.
+    statement = _IN_LIST.sub('(?)', statement)
+    statement = _NUMBER.sub('?', statement)
+    statement = _IN_LIST.sub('(?)', statement)
+    return _SPACE.sub(' ', statement).strip()
+
+def fingerprint(statement: str) -> str:
+    return hashlib.sha1(normalize(statement).encode()).hexdigest()[:16]
+
+def _stack() -> list:
+    # Async sessions run the DBAPI call in a child greenlet, so keep walking into the
+    # parent greenlet to reach the route that awaited the query.
+    frames = []
+    frame = sys._getframe(1)
+    current = greenlet.getcurrent() if greenlet else None
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_PROJECT) and not filename.endswith('profiler.py'):
+            frames.append(f'{Path(filename).relative_to(_PROJECT)}:{frame.f_lineno} in {frame.f_code.co_name}')
+        frame = frame.f_back
+        if frame is None and current is not None and current.parent is not None:
+            current = current.parent
+            frame = current.gr_frame
+    return frames[::-1]
+
+class RequestProfile:
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.statements = {}
+        self.slow = []
+
+    def record(self, statement: str, elapsed_ms: float):
+        key = fingerprint(statement)
+        entry = self.statements.get(key)
+        if entry is None:
+            entry = self.statements[key] = {'fingerprint': key, 'statement': normalize(statement),
+                                            'count': 0, 'total_ms': 0.0, 'stack': _stack()}
+        entry['count'] += 1
+        entry['total_ms'] += elapsed_ms
+        if elapsed_ms >= QUERY_PROFILER_SLOW_MS:
+            self.slow.append({'fingerprint': key, 'statement': entry['statement'],
+                              'elapsed_ms': round(elapsed_ms, 3), 'stack': _stack()})
+
+    def findings(self, route: str) -> Optional[dict]:
+        repeated = [dict(entry, total_ms=round(entry['total_ms'], 3)) for entry in self.statements.values()
+                    if entry['count'] >= QUERY_PROFILER_REPEAT_THRESHOLD]
+        if not repeated and not self.slow:
+            return None
+        return {
+            'time': datetime.utcnow().isoformat(),
+            'method': self.method,
+            'route': route,
+            'path': self.path,
+            'queries': sum(entry['count'] for entry in self.statements.values()),
+            'repeated': repeated,
+            'slow': self.slow,
+        }
+
+_profile: ContextVar[Optional[RequestProfile]] = ContextVar('query_profile', default=None)
+_report_lock = threading.Lock()
+
+def write_report(findings: dict, path: Path = QUERY_PROFILER_REPORT):
+    logger.warning('Query profiler: %s %s ran %s queries (%s repeated, %s slow).', findings['method'],
+                   findings['route'], findings['queries'], len(findings['repeated']), len(findings['slow']))
+    with _report_lock, open(path, 'a') as report:
+        report.write(json.dumps(findings) + '\n')
+
+def profile_engine(engine):
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _profile.get() is not None:
+            context._profiler_start = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        profile = _profile.get()
+        start = getattr(context, '_profiler_start', None)
+        if profile is not None and start is not None:
+            profile.record(statement, (time.perf_counter() - start) * 1000)
+
+class QueryProfilerMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or random.random() >= QUERY_PROFILER_SAMPLE_RATE:
+            return await self.app(scope, receive, send)
+        profile = RequestProfile(scope['method'], scope['path'])
+        token = _profile.set(profile)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _profile.reset(token)
+            route = scope.get('route')
+            findings = profile.findings(route.path if route is not None else scope['path'])
+            if findings:
+                try:
+                    write_report(findings)
+                except OSError:
+                    logger.exception('Could not write query profiler report.')
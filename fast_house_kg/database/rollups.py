@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import math
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from fast_house_kg.config import ROLLUP_REFRESH_INTERVAL, ROLLUP_BATCH
+from fast_house_kg.database.db import SessionLocal, dialect_insert
+from fast_house_kg.database.models import Property, PriceRollup, PriceRollupDirty, ROLLUP_KEYS
+
+logger = logging.getLogger(__name__)
+
+# Log-spaced buckets, 50 per decade: merged quantiles are within ~2.3% of the exact value.
+BUCKETS_PER_DECADE = 50
+
+def bucket(value: float) -> int:
+    return math.floor(math.log10(value) * BUCKETS_PER_DECADE)
+
+def histogram(values: Iterable[float]) -> Dict[str, int]:
+    counts = defaultdict(int)
+    for value in values:
+        if value > 0:
+            counts[str(bucket(value))] += 1
+    return dict(counts)
+
+def merge(histograms: Iterable[Dict[str, int]]) -> Dict[int, int]:
+    merged = defaultdict(int)
+    for counts in histograms:
+        for key, count in counts.items():
+            merged[int(key)] += count
+    return merged
+
+def quantile(merged: Dict[int, int], q: float) -> Optional[float]:
+    total = sum(merged.values())
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for key in sorted(merged):
+        count = merged[key]
+        if seen + count >= rank:
+            fraction = (rank - seen) / count if count else 0
+            return 10 ** ((key + fraction) / BUCKETS_PER_DECADE)
+        seen += count
+    return 10 ** ((max(merged) + 1) / BUCKETS_PER_DECADE)
+
+def summarize(total: float, count: int, histograms: List[Dict[str, int]]) -> Optional[dict]:
+    if not count:
+        return None
+    merged = merge(histograms)
+    return {
+        'mean': total / count,
+        'median': quantile(merged, 0.5),
+        'p10': quantile(merged, 0.1),
+        'p90': quantile(merged, 0.9),
+    }
+
+async def refresh_dirty_rollups(db: AsyncSession, limit: int = ROLLUP_BATCH) -> int:
+    key_columns = [getattr(PriceRollupDirty, name) for name in ROLLUP_KEYS]
+    marks = [tuple(row) for row in
+             (await db.execute(select(*key_columns, PriceRollupDirty.sequence).limit(limit))).all()]
+    if not marks:
+        return 0
+    keys = [mark[:-1] for mark in marks]
+    property_keys = [getattr(Property, name) for name in ROLLUP_KEYS]
+    rows = await db.execute(select(*property_keys, Property.price, Property.area)
+                            .where(tuple_(*property_keys).in_(keys)))
+    groups = defaultdict(list)
+    for row in rows:
+        groups[tuple(row[:len(ROLLUP_KEYS)])].append((row.price, row.area))
+    rollup_columns = [getattr(PriceRollup, name) for name in ROLLUP_KEYS]
+    empty = [key for key in keys if key not in groups]
+    if empty:
+        await db.execute(delete(PriceRollup).where(tuple_(*rollup_columns).in_(empty)))
+    if groups:
+        values = []
+        for key, items in groups.items():
+            per_m2 = [price / area for price, area in items if area]
+            values.append({
+                **dict(zip(ROLLUP_KEYS, key)),
+                'count': len(items),
+                'price_sum': sum(price for price, _ in items),
+                'price_histogram': histogram(price for price, _ in items),
+                'area_count': len(per_m2),
+                'price_per_m2_sum': sum(per_m2),
+                'price_per_m2_histogram': histogram(per_m2),
+            })
+        insert = dialect_insert(db.get_bind().dialect.name)
+        stmt = insert(PriceRollup).values(values)
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=rollup_columns,
+            set_={**{name: stmt.excluded[name] for name in values[0] if name not in ROLLUP_KEYS},
+                  'updated_at': datetime.utcnow()},
+        ))
+    # A key marked again while we aggregated has a new sequence and stays dirty for the next refresh.
+    await db.execute(delete(PriceRollupDirty).where(tuple_(*key_columns, PriceRollupDirty.sequence).in_(marks)))
+    await db.commit()
+    return len(keys)
+
+async def refresh_price_rollups():
+    while True:
+        try:
+            async with SessionLocal() as db:
+                while await refresh_dirty_rollups(db) == ROLLUP_BATCH:
+                    pass
+        except Exception:
+            logger.exception('Price rollup refresh failed.')
+        await asyncio.sleep(ROLLUP_REFRESH_INTERVAL)
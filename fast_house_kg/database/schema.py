@@ -1,8 +1,10 @@
 from pydantic import BaseModel, EmailStr, Field
 from enum import Enum
-from typing import Optional, List
+from typing import Optional, List, Dict, Generic, TypeVar
 from datetime import date
 
+T = TypeVar('T')
+
 class StatusChoices(str, Enum):
     seller = 'Seller'
     buyer = 'Buyer'
@@ -32,6 +34,10 @@ class ConditionChoices(str, Enum):
     middle = 'Middle'
     not_finished = 'Not finished'
 
+class MediaKindChoices(str, Enum):
+    image = 'Image'
+    document = 'Document'
+
 class UserProfileLoginSchema(BaseModel):
     username: str
     password: str
@@ -78,7 +84,10 @@ class PropertyOutSchema(BaseModel):
     images: str
     documents: str
     seller_id: int
+    external_id: Optional[str] = None
     created_date: date
+    estimated_price: Optional[float] = None
+    model_version: Optional[str] = None
 class PropertyInputSchema(BaseModel):
     title: str
     description: str
@@ -96,6 +105,22 @@ class PropertyInputSchema(BaseModel):
     images: str
     documents: str
     seller_id: int
+    external_id: Optional[str] = Field(None, max_length=64)
+
+class SimilarPropertySchema(PropertyOutSchema):
+    distance: float
+
+class PropertyMediaOutSchema(BaseModel):
+    id: int
+    property_id: int
+    kind: MediaKindChoices
+    sha256: str
+    content_type: str
+    size: int
+    filename: Optional[str]
+    width: Optional[int]
+    height: Optional[int]
+    variants: List[int]
 
 class ReviewOutSchema(BaseModel):
     id: int
@@ -110,11 +135,44 @@ class ReviewInputSchema(BaseModel):
     rating: int = Field(ge=0, le=10)
     comment: str = Field(max_length=100)
 
+class SellerReputationOutSchema(BaseModel):
+    seller_id: int
+    rating_count: int
+    rating_sum: int
+    average: Optional[float]
+    histogram: Dict[int, int]
+
+class PriceStatsSchema(BaseModel):
+    mean: float
+    median: float
+    p10: float
+    p90: float
+
+class PriceRollupOutSchema(BaseModel):
+    region: Optional[RegionChoices] = None
+    city_id: Optional[int] = None
+    district_id: Optional[int] = None
+    property_type: Optional[PropertyChoices] = None
+    rooms: Optional[int] = None
+    count: int
+    price: Optional[PriceStatsSchema]
+    price_per_m2: Optional[PriceStatsSchema]
+
 class HousePredictSchema(BaseModel):
-    GrLivArea: int
-    YearBuilt: int
-    GarageCars: int
-    TotalBsmtSF: int
-    FullBath: int
-    OverallQual: int
-    Neighborhood: str
\ No newline at end of file
+    # Bounded well past the training data, so no value can overflow the float features.
+    GrLivArea: int = Field(ge=0, le=100_000)
+    YearBuilt: int = Field(ge=1800, le=2100)
+    GarageCars: int = Field(ge=0, le=20)
+    TotalBsmtSF: int = Field(ge=0, le=100_000)
+    FullBath: int = Field(ge=0, le=20)
+    OverallQual: int = Field(ge=1, le=10)
+    Neighborhood: str = Field(max_length=32)
+
+class BulkResultSchema(BaseModel):
+    received: int
+    written: int
+    errors: List[dict]
+
+class PageSchema(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
\ No newline at end of file
@@ -0,0 +1,56 @@
+import hashlib
+import uuid
+from pathlib import Path
+from typing import Iterable, NamedTuple
+import anyio
+from fastapi import UploadFile
+
+CHUNK_SIZE = 1024 * 1024
+
+class MediaTooLarge(Exception):
+    pass
+
+class StoredFile(NamedTuple):
+    sha256: str
+    size: int
+    path: Path
+    created: bool
+
+class MediaStore:
+    """Content-addressed blobs: a file lives at objects/<sha256 prefix>/<sha256>, so identical uploads share it."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def path(self, digest: str) -> Path:
+        return self.root / 'objects' / digest[:2] / digest[2:4] / digest
+
+    def variant_path(self, digest: str, width: int) -> Path:
+        return self.root / 'variants' / digest[:2] / digest[2:4] / f'{digest}-{width}.webp'
+
+    async def save(self, upload: UploadFile, max_bytes: int) -> StoredFile:
+        tmp_dir = anyio.Path(self.root / 'tmp')
+        await tmp_dir.mkdir(parents=True, exist_ok=True)
+        tmp = tmp_dir / uuid.uuid4().hex
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            async with await anyio.open_file(tmp, 'wb') as out:
+                while chunk := await upload.read(CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise MediaTooLarge(max_bytes)
+                    digest.update(chunk)
+                    await out.write(chunk)
+            path = anyio.Path(self.path(digest.hexdigest()))
+            created = not await path.exists()
+            if created:
+                await path.parent.mkdir(parents=True, exist_ok=True)
+                await tmp.replace(path)
+        finally:
+            await tmp.unlink(missing_ok=True)
+        return StoredFile(digest.hexdigest(), size, Path(path), created)
+
+    async def remove(self, digest: str, widths: Iterable[int] = ()):
+        for path in (self.path(digest), *(self.variant_path(digest, width) for width in widths)):
+            await anyio.Path(path).unlink(missing_ok=True)
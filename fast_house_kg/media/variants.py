@@ -0,0 +1,36 @@
+import os
+from typing import Dict
+
+ORIENTATION = 0x0112
+IMAGE_TYPES = {'JPEG': 'image/jpeg', 'PNG': 'image/png', 'WEBP': 'image/webp', 'GIF': 'image/gif'}
+
+def make_variants(source: str, targets: Dict[int, str], quality: int) -> dict:
+    """Write a WebP per target width (never upscaled) and return the original's type and size.
+
+    Runs in a worker process; raises ValueError for anything that is not a supported image.
+    """
+    # Pillow is imported here so only the worker processes pay for it, not the app at startup.
+    from PIL import Image, ImageOps
+    with Image.open(source) as image:
+        if image.format not in IMAGE_TYPES:
+            raise ValueError(f'Unsupported image format {image.format}.')
+        content_type = IMAGE_TYPES[image.format]
+        width, height = image.size
+        if image.getexif().get(ORIENTATION) in (5, 6, 7, 8):
+            width, height = height, width
+        missing = {target: path for target, path in targets.items() if not os.path.exists(path)}
+        if missing:
+            # JPEG decodes straight to a reduced scale that still covers the largest variant.
+            largest = max(missing)
+            image.draft('RGB', (largest, largest))
+            image = ImageOps.exif_transpose(image)
+            image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+            for target in sorted(missing, reverse=True):
+                scale = min(1, target / image.width)
+                image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                                     Image.Resampling.LANCZOS, reducing_gap=3.0)
+                os.makedirs(os.path.dirname(missing[target]), exist_ok=True)
+                tmp = f'{missing[target]}.{os.getpid()}.tmp'
+                image.save(tmp, 'WEBP', quality=quality, method=4)
+                os.replace(tmp, missing[target])
+    return {'content_type': content_type, 'width': width, 'height': height}
@@ -0,0 +1,160 @@
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+metrics: List['Metric'] = []
+
+def _labels(names: Tuple[str, ...], values: Tuple) -> str:
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+class Metric:
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        metrics.append(self)
+
+    def samples(self):
+        return []
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        for suffix, names, values, value in self.samples():
+            lines.append(f'{self.name}{suffix}{_labels(names, values)} {value}')
+        return '\n'.join(lines)
+
+class Counter(Metric):
+    type = 'counter'
+
+    def __init__(self, *args, function: Optional[Callable[[], Dict[Tuple, float]]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.values: Dict[Tuple, float] = {}
+        self.function = function
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labels):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        values = self.function() if self.function else dict(self.values)
+        return [('', self.labelnames, labels, value) for labels, value in values.items()]
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def dec(self, amount: float = 1, *labels):
+        self.inc(-amount, *labels)
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, *args, buckets=LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(buckets)
+        self.values: Dict[Tuple, list] = {}
+        # Observed from executor threads (inference, password hashing, pool checkout) as well as the loop.
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.values.get(labels)
+            if series is None:
+                series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            snapshot = [(labels, list(counts), total, count) for labels, (counts, total, count) in self.values.items()]
+        samples = []
+        names = self.labelnames + ('le',)
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                samples.append(('_bucket', names, labels + (bound,), cumulative))
+            samples.append(('_sum', self.labelnames, labels, total))
+            samples.append(('_count', self.labelnames, labels, count))
+        return samples
+
+def render() -> str:
+    return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+request_latency = Histogram('http_request_duration_seconds', 'HTTP request latency by route.',
+                            ('method', 'route', 'status'))
+requests_in_flight = Gauge('http_requests_in_flight', 'HTTP requests currently being served.')
+request_queries = Histogram('http_request_db_queries', 'Database queries executed per request.',
+                            ('method', 'route'), buckets=COUNT_BUCKETS)
+db_query_latency = Histogram('db_query_duration_seconds', 'Database statement execution time.')
+pool_checkout_wait = Histogram('db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection.')
+model_inference = Histogram('model_inference_seconds', 'Scaler transform plus model predict time per batch.')
+password_hashing = Histogram('password_hash_seconds', 'bcrypt hash/verify time.')
+
+_request_queries: ContextVar[Optional[list]] = ContextVar('request_queries', default=None)
+
+def instrument_engine(engine):
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_start = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        db_query_latency.observe(time.perf_counter() - context._metrics_start)
+        counter = _request_queries.get()
+        if counter is not None:
+            counter[0] += 1
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_checkout_wait.observe(time.perf_counter() - start)
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        status = [500]
+        queries = [0]
+        token = _request_queries.set(queries)
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            requests_in_flight.dec()
+            _request_queries.reset(token)
+            route = scope.get('route')
+            route = route.path if route is not None else 'unmatched'
+            request_latency.observe(elapsed, scope['method'], route, status[0])
+            request_queries.observe(queries[0], scope['method'], route)
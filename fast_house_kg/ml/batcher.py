@@ -0,0 +1,118 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+class PredictionBatcher:
+    def __init__(self, predict_fn: Callable[[List[Any]], List[Any]], max_batch_size: int = 64,
+                 max_wait_ms: float = 5, workers: int = 1):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='predict')
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.batch_sizes = {}
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.workers)
+            self._task = asyncio.get_running_loop().create_task(self._collect())
+
+    async def predict(self, item: Any) -> Any:
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, future, time.perf_counter()))
+        return await future
+
+    async def predict_many(self, items: List[Any]) -> List[Any]:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.predict_fn, items)
+
+    async def predict_each(self, items: List[Any]) -> List[Any]:
+        """Like predict_many, but an item that fails gets its exception in place of a result.
+
+        A failed batch is retried one item at a time, so one bad item doesn't fail the others.
+        """
+        try:
+            return await self.predict_many(items)
+        except Exception as e:
+            if len(items) == 1:
+                return [e]
+        results = []
+        for item in items:
+            try:
+                results.extend(await self.predict_many([item]))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            loop.create_task(self._run(batch))
+
+    async def _run(self, batch):
+        try:
+            batch = [entry for entry in batch if not entry[1].done()]
+            if not batch:
+                return
+            self._record(batch)
+            results = await self.predict_each([item for item, _, _ in batch])
+            for (_, future, _), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def _record(self, batch):
+        now = time.perf_counter()
+        size = len(batch)
+        self.batches += 1
+        self.items += size
+        self.largest_batch = max(self.largest_batch, size)
+        self.batch_sizes[size] = self.batch_sizes.get(size, 0) + 1
+        for _, _, enqueued in batch:
+            wait = now - enqueued
+            self.queue_wait_total += wait
+            self.queue_wait_max = max(self.queue_wait_max, wait)
+
+    def stats(self) -> dict:
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'workers': self.workers,
+            'queue_depth': self._queue.qsize() if self._queue else 0,
+            'batches': self.batches,
+            'items': self.items,
+            'largest_batch': self.largest_batch,
+            'avg_batch_size': self.items / self.batches if self.batches else 0,
+            'batch_sizes': dict(sorted(self.batch_sizes.items())),
+            'avg_queue_wait_ms': self.queue_wait_total / self.items * 1000 if self.items else 0,
+            'max_queue_wait_ms': self.queue_wait_max * 1000,
+        }
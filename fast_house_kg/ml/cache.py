@@ -0,0 +1,125 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+
+class SQLiteCacheBackend:
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        with self._connection() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS prediction_cache '
+                               '(key TEXT PRIMARY KEY, value REAL NOT NULL, expires REAL NOT NULL)')
+        # A SQLite connection must not be used across fork(); pre-forked workers open their own.
+        os.register_at_fork(after_in_child=self._reset_connections)
+
+    def _reset_connections(self):
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=1)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def get_many(self, keys: List[str]) -> Dict[str, float]:
+        if not keys:
+            return {}
+        placeholders = ','.join('?' * len(keys))
+        rows = self._connection().execute(
+            f'SELECT key, value FROM prediction_cache WHERE expires > ? AND key IN ({placeholders})',
+            [time.time(), *keys],
+        ).fetchall()
+        return dict(rows)
+
+    def set_many(self, items: Dict[str, float]):
+        if not items:
+            return
+        expires = time.time() + self.ttl
+        with self._connection() as connection:
+            connection.executemany('INSERT OR REPLACE INTO prediction_cache (key, value, expires) VALUES (?, ?, ?)',
+                                   [(key, value, expires) for key, value in items.items()])
+            self._writes += 1
+            if self._writes % 1000 == 0:
+                connection.execute('DELETE FROM prediction_cache WHERE expires <= ?', (time.time(),))
+
+class PredictionCache:
+    def __init__(self, maxsize: int = 10000, ttl: float = 3600, shared: Optional[SQLiteCacheBackend] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.shared = shared
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.shared_hits = 0
+        self.shared_misses = 0
+
+    def get(self, key: Hashable):
+        if self.maxsize <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def shared_get_many(self, keys: List[Hashable]) -> Dict[Hashable, float]:
+        if self.shared is None:
+            return {}
+        encoded = {json.dumps(key): key for key in keys}
+        found = {encoded[key]: value for key, value in self.shared.get_many(list(encoded)).items()}
+        self.shared_hits += len(found)
+        self.shared_misses += len(keys) - len(found)
+        return found
+
+    def shared_set_many(self, items: Dict[Hashable, float]):
+        if self.shared is not None:
+            self.shared.set_many({json.dumps(key): value for key, value in items.items()})
+
+    def stats(self) -> dict:
+        return {
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'shared': self.shared.path if self.shared else None,
+            'shared_hits': self.shared_hits,
+            'shared_misses': self.shared_misses,
+        }
@@ -0,0 +1,20 @@
+import numpy as np
+
+NUMERIC_FEATURES = ('GrLivArea', 'YearBuilt', 'GarageCars', 'TotalBsmtSF', 'FullBath', 'OverallQual')
+NEIGHBORHOODS = (
+    'Blueste', 'BrDale', 'BrkSide', 'ClearCr', 'CollgCr', 'Crawfor', 'Edwards', 'Gilbert',
+    'IDOTRR', 'MeadowV', 'Mitchel', 'NAmes', 'NPkVill', 'NWAmes', 'NoRidge', 'NridgHt',
+    'OldTown', 'SWISU', 'Sawyer', 'SawyerW', 'Somerst', 'StoneBr', 'Timber', 'Veenker',
+)
+NEIGHBORHOOD_INDEX = {name: len(NUMERIC_FEATURES) + i for i, name in enumerate(NEIGHBORHOODS)}
+FEATURE_COUNT = len(NUMERIC_FEATURES) + len(NEIGHBORHOODS)
+
+def encode_houses(houses) -> np.ndarray:
+    features = np.zeros((len(houses), FEATURE_COUNT))
+    features[:, :len(NUMERIC_FEATURES)] = [[getattr(house, name) for name in NUMERIC_FEATURES] for house in houses]
+    # Unknown neighborhoods keep an all-zero one-hot, same as the baseline category.
+    columns = np.fromiter((NEIGHBORHOOD_INDEX.get(house.Neighborhood, -1) for house in houses),
+                          dtype=np.intp, count=len(houses))
+    rows = np.flatnonzero(columns >= 0)
+    features[rows, columns[rows]] = 1
+    return features
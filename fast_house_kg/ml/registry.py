@@ -0,0 +1,183 @@
+import hashlib
+import re
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from fast_house_kg.config import BASE_DIR, MODEL_DIR, MODEL_MMAP
+
+MODEL_FILE = 'model.pkl'
+SCALER_FILE = 'scaler.pkl'
+DEFAULT_VERSION = 'default'
+# The version every worker should serve, written by whichever worker handled an activate or rollback.
+ACTIVE_FILE = 'ACTIVE'
+# Version names are directory names under the model dir: no separators, no leading dot.
+VERSION_NAME = re.compile(r'[A-Za-z0-9][A-Za-z0-9._-]*')
+
+def version_key(version: str) -> list:
+    """Orders version names by their numeric parts, so v9 comes before v10."""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', version)]
+
+def file_signature(*paths: Path) -> tuple:
+    return tuple((stat.st_mtime_ns, stat.st_size) for stat in (path.stat() for path in paths))
+
+class ModelVersion:
+    def __init__(self, version: str, model, scaler, load_seconds: float, memory_bytes: int, disk_bytes: int,
+                 signature: tuple = ()):
+        self.version = version
+        self.model = model
+        self.scaler = scaler
+        self.load_seconds = load_seconds
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.signature = signature
+        self.loaded_at = datetime.utcnow()
+
+    @property
+    def cache_key(self) -> str:
+        """Names this load of the version: files rewritten under the same name get a new key in shared caches."""
+        return f'{self.version}@{hashlib.sha1(repr(self.signature).encode()).hexdigest()[:12]}'
+
+    def predict(self, features):
+        return self.model.predict(self.scaler.transform(features))
+
+    def info(self) -> dict:
+        return {
+            'version': self.version,
+            'load_seconds': round(self.load_seconds, 4),
+            'memory_bytes': self.memory_bytes,
+            'disk_bytes': self.disk_bytes,
+            'loaded_at': self.loaded_at,
+        }
+
+class ModelRegistry:
+    def __init__(self, model_dir: Path, fallback: Optional[Dict[str, Path]] = None, mmap: bool = True):
+        self.model_dir = Path(model_dir)
+        self.fallback = fallback or {}
+        self.mmap_mode = 'r' if mmap else None
+        self.active: Optional[ModelVersion] = None
+        self.previous: Optional[ModelVersion] = None
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[ModelVersion], None]] = []
+        self._published_signature: Optional[tuple] = None
+
+    @property
+    def active_file(self) -> Path:
+        return self.model_dir / ACTIVE_FILE
+
+    def _paths(self, version: str):
+        if not VERSION_NAME.fullmatch(version):
+            raise KeyError(version)
+        directory = self.model_dir / version
+        if (directory / MODEL_FILE).is_file() and (directory / SCALER_FILE).is_file():
+            return directory / MODEL_FILE, directory / SCALER_FILE
+        if version == DEFAULT_VERSION and self.fallback:
+            return self.fallback['model'], self.fallback['scaler']
+        raise KeyError(version)
+
+    def available(self) -> List[str]:
+        versions = []
+        if self.model_dir.is_dir():
+            versions = sorted((path.name for path in self.model_dir.iterdir()
+                               if (path / MODEL_FILE).is_file() and (path / SCALER_FILE).is_file()), key=version_key)
+        if not versions and self.fallback:
+            versions = [DEFAULT_VERSION]
+        return versions
+
+    def load(self, version: str) -> ModelVersion:
+        model_path, scaler_path = self._paths(version)
+        signature = file_signature(model_path, scaler_path)
+        # A loaded version is reused only while its files are unchanged on disk.
+        for loaded in (self.active, self.previous):
+            if loaded is not None and loaded.version == version and loaded.signature == signature:
+                return loaded
+        # Imported on first load rather than at startup. scikit-learn is imported before tracing starts:
+        # under tracemalloc its import is several times slower, and its memory isn't the model's.
+        import joblib
+        import sklearn.base
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            scaler = joblib.load(scaler_path, mmap_mode=self.mmap_mode)
+            model = joblib.load(model_path, mmap_mode=self.mmap_mode)
+            load_seconds = time.perf_counter() - start
+            memory_bytes = tracemalloc.get_traced_memory()[0] - before
+        finally:
+            if not tracing:
+                tracemalloc.stop()
+        disk_bytes = model_path.stat().st_size + scaler_path.stat().st_size
+        return ModelVersion(version, model, scaler, load_seconds, memory_bytes, disk_bytes, signature)
+
+    def activate(self, version: Optional[str] = None) -> ModelVersion:
+        if version is None:
+            available = self.available()
+            if not available:
+                raise KeyError(version)
+            version = available[-1]
+        loaded = self.load(version)
+        with self._lock:
+            if self.active is not None and self.active.version == loaded.version:
+                # Reloaded because its files changed: replace it rather than keeping the stale copy to roll back to.
+                self.active = loaded
+            elif self.active is not loaded:
+                self.previous, self.active = self.active, loaded
+        self._notify(loaded)
+        return loaded
+
+    def rollback(self) -> ModelVersion:
+        with self._lock:
+            if self.previous is None:
+                raise LookupError('No previous model version.')
+            self.active, self.previous = self.previous, self.active
+            active = self.active
+        self._notify(active)
+        return active
+
+    def publish(self, version: str):
+        """Records `version` as the one every worker serves; the others pick it up in `sync`."""
+        self.model_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.active_file.with_suffix('.tmp')
+        tmp.write_text(version)
+        tmp.replace(self.active_file)
+        self._published_signature = (file_signature(self.active_file), version)
+
+    def published(self) -> Optional[str]:
+        try:
+            return self.active_file.read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def sync(self) -> Optional[ModelVersion]:
+        """Activates the published version when the active file changed since this process last looked."""
+        try:
+            # The name is part of it: two quick publishes can share an mtime on coarse-grained filesystems.
+            signature = (file_signature(self.active_file), self.published())
+        except FileNotFoundError:
+            return None
+        if signature == self._published_signature:
+            return None
+        self._published_signature = signature
+        version = signature[1]
+        return self.activate(version) if version else None
+
+    def on_activate(self, listener: Callable[[ModelVersion], None]):
+        self._listeners.append(listener)
+
+    def _notify(self, version: ModelVersion):
+        for listener in self._listeners:
+            listener(version)
+
+    def info(self) -> dict:
+        return {
+            'available': self.available(),
+            'active': self.active.info() if self.active else None,
+            'previous': self.previous.info() if self.previous else None,
+        }
+
+registry = ModelRegistry(MODEL_DIR, fallback={'model': BASE_DIR / 'model (1).pkl',
+                                              'scaler': BASE_DIR / 'scaler (1).pkl'}, mmap=MODEL_MMAP)
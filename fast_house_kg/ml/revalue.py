@@ -0,0 +1,205 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+from sqlalchemy import Float, Integer, column, delete, or_, select, update, values
+from sqlalchemy.exc import IntegrityError
+from fast_house_kg.config import (MODEL_VERSION, REVALUE_CHUNK_SIZE, REVALUE_CHECKPOINT, REVALUE_LOCK_TTL,
+                                  REVALUE_WORKERS, REVALUE_YEAR_BUILT)
+from fast_house_kg.database.db import SessionLocal, engine
+from fast_house_kg.database.models import ConditionChoices, JobLock, Property, PropertyChoices
+from fast_house_kg.ml.features import FEATURE_COUNT, NUMERIC_FEATURES
+from fast_house_kg.ml.registry import ModelVersion, registry
+from fast_house_kg.metrics import model_inference
+
+SCAN_COLUMNS = (Property.id, Property.version, Property.area, Property.rooms, Property.condition,
+                Property.property_type)
+
+SQ_FT_PER_M2 = 10.7639
+CONDITION_QUALITY = {
+    ConditionChoices.euro: 8,
+    ConditionChoices.good: 7,
+    ConditionChoices.middle: 5,
+    ConditionChoices.for_finishing: 4,
+    ConditionChoices.not_finished: 3,
+}
+GARAGE_TYPES = (PropertyChoices.house, PropertyChoices.cottage)
+
+LOCK_NAME = 'revalue'
+
+class RevalueRunning(Exception):
+    pass
+
+def encode_properties(rows: List) -> np.ndarray:
+    # Listings carry no build year, basement or neighborhood, so those use fixed
+    # defaults and the baseline neighborhood; the estimate is a relative signal.
+    features = np.zeros((len(rows), FEATURE_COUNT))
+    features[:, :len(NUMERIC_FEATURES)] = [[
+        row.area * SQ_FT_PER_M2,
+        REVALUE_YEAR_BUILT,
+        1 if row.property_type in GARAGE_TYPES else 0,
+        0,
+        max(1, row.rooms // 2),
+        CONDITION_QUALITY.get(row.condition, 5),
+    ] for row in rows]
+    return features
+
+property_table = Property.__table__
+
+def write_stmt(rows, prices, version: str):
+    """One UPDATE ... FROM a VALUES CTE per chunk. The version match skips rows edited since they were read,
+    and RETURNING reports the rows actually written: executemany rowcount isn't reliable on every driver."""
+    scores = values(column('id', Integer), column('version', Integer), column('estimated_price', Float),
+                    name='scores').data([(row.id, row.version, price) for row, price in zip(rows, prices)]).cte()
+    return (
+        update(property_table)
+        .where(property_table.c.id == scores.c.id, property_table.c.version == scores.c.version)
+        .values(estimated_price=scores.c.estimated_price, model_version=version,
+                version=property_table.c.version + 1)
+        .returning(property_table.c.id)
+    )
+
+async def lock_holder(db) -> Optional[str]:
+    return await db.scalar(select(JobLock.owner).where(JobLock.name == LOCK_NAME,
+                                                       JobLock.expires_at > datetime.utcnow()))
+
+async def acquire_lock(db, owner: str):
+    """Takes the re-valuation lock row, so the CLI and the API can't run at the same time."""
+    now = datetime.utcnow()
+    await db.execute(delete(JobLock).where(JobLock.name == LOCK_NAME, JobLock.expires_at <= now))
+    db.add(JobLock(name=LOCK_NAME, owner=owner, expires_at=now + timedelta(seconds=REVALUE_LOCK_TTL)))
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise RevalueRunning(f'Re-valuation is already running ({await lock_holder(db)}).')
+
+async def renew_lock(db, owner: str):
+    result = await db.execute(update(JobLock).where(JobLock.name == LOCK_NAME, JobLock.owner == owner)
+                              .values(expires_at=datetime.utcnow() + timedelta(seconds=REVALUE_LOCK_TTL)))
+    if result.rowcount != 1:
+        raise RevalueRunning('The re-valuation lock expired and was taken by another run.')
+
+async def release_lock(db, owner: str):
+    await db.execute(delete(JobLock).where(JobLock.name == LOCK_NAME, JobLock.owner == owner))
+    await db.commit()
+
+_worker_model: Optional[ModelVersion] = None
+
+def _init_worker(version: str):
+    global _worker_model
+    _worker_model = registry.load(version)
+
+def _score(features) -> list:
+    return _worker_model.predict(features).tolist()
+
+def read_checkpoint(path: Path, version: str) -> int:
+    try:
+        checkpoint = json.loads(path.read_text())
+    except (FileNotFoundError, ValueError):
+        return 0
+    return checkpoint['last_id'] if checkpoint.get('model_version') == version else 0
+
+def write_checkpoint(path: Path, version: str, last_id: int):
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(json.dumps({'model_version': version, 'last_id': last_id}))
+    tmp.replace(path)
+
+async def revalue_properties(model_version: Optional[ModelVersion] = None, workers: int = REVALUE_WORKERS,
+                             chunk_size: int = REVALUE_CHUNK_SIZE, checkpoint: Path = REVALUE_CHECKPOINT,
+                             restart: bool = False, progress: Optional[dict] = None) -> dict:
+    model_version = model_version or registry.active
+    version = model_version.version
+    last_id = 0 if restart else read_checkpoint(checkpoint, version)
+    progress = progress if progress is not None else {}
+    progress.update({'model_version': version, 'resumed_from': last_id, 'scanned': 0, 'written': 0,
+                     'skipped': 0, 'chunks': 0, 'seconds': 0.0, 'done': False})
+    loop = asyncio.get_running_loop()
+    executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(version,)) if workers else None
+    start = time.perf_counter()
+    owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+    def score(features):
+        if executor is not None:
+            return loop.run_in_executor(executor, _score, features)
+        return asyncio.to_thread(lambda: model_version.predict(features).tolist())
+
+    async def write(db, rows, future):
+        scored = time.perf_counter()
+        prices = await future
+        model_inference.observe(time.perf_counter() - scored)
+        written = len((await db.execute(write_stmt(rows, prices, version))).all())
+        # Renewed in the chunk's transaction: a run that lost the lock rolls its last chunk back.
+        await renew_lock(db, owner)
+        await db.commit()
+        progress['written'] += written
+        progress['skipped'] += len(rows) - written
+        progress['chunks'] += 1
+        write_checkpoint(checkpoint, version, rows[-1].id)
+
+    try:
+        async with SessionLocal() as db:
+            await acquire_lock(db, owner)
+            try:
+                # Keep up to `workers` chunks scoring while the next one is read; write back in id order.
+                pending = deque()
+                while True:
+                    rows = (await db.execute(
+                        select(*SCAN_COLUMNS)
+                        .where(Property.id > last_id,
+                               or_(Property.model_version.is_(None), Property.model_version != version))
+                        .order_by(Property.id)
+                        .limit(chunk_size)
+                    )).all()
+                    if rows:
+                        last_id = rows[-1].id
+                        progress['scanned'] += len(rows)
+                        pending.append((rows, score(encode_properties(rows))))
+                    while pending and (not rows or len(pending) > max(workers, 1)):
+                        await write(db, *pending.popleft())
+                    if len(rows) < chunk_size and not pending:
+                        break
+            finally:
+                await db.rollback()
+                await release_lock(db, owner)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        progress['seconds'] = round(time.perf_counter() - start, 3)
+    checkpoint.unlink(missing_ok=True)
+    progress['done'] = True
+    return progress
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-score stored listings with the active price model.')
+    parser.add_argument('--model-version', default=MODEL_VERSION, help='model version to score with')
+    parser.add_argument('--workers', type=int, default=REVALUE_WORKERS, help='scoring processes, 0 scores on a thread')
+    parser.add_argument('--chunk-size', type=int, default=REVALUE_CHUNK_SIZE)
+    parser.add_argument('--checkpoint', type=Path, default=REVALUE_CHECKPOINT)
+    parser.add_argument('--restart', action='store_true', help='ignore an existing checkpoint')
+    args = parser.parse_args()
+    model_version = registry.activate(args.model_version)
+
+    async def run():
+        try:
+            return await revalue_properties(model_version, args.workers, args.chunk_size, args.checkpoint,
+                                            args.restart)
+        finally:
+            await engine.dispose()
+
+    try:
+        print(json.dumps(asyncio.run(run())))
+    except RevalueRunning as exc:
+        raise SystemExit(str(exc))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+"""Pre-fork launcher: the master imports the app and loads the price model once, then forks the workers.
+
+Workers share the master's heap and model arrays copy-on-write, so a further worker costs its unique memory
+rather than a full copy of the app. Per-worker unique memory and startup time are logged once all are ready.
+
+    python -m fast_house_kg.prefork --workers 4
+"""
+import argparse
+import gc
+import logging
+import os
+import select
+import signal
+import socket
+import time
+from pathlib import Path
+from typing import Dict, Optional
+import uvicorn
+from fast_house_kg.config import (SERVER_HOST, SERVER_PORT, SERVER_WORKERS, SERVER_BACKLOG,
+                                  SERVER_MEMORY_REPORT_INTERVAL)
+
+logger = logging.getLogger('fast_house_kg.prefork')
+
+SHUTDOWN_TIMEOUT = 30
+MB = 1024 * 1024
+
+def memory_usage(pid: int) -> dict:
+    """Bytes from /proc/<pid>/smaps_rollup; `uss` is what the process alone holds and would free on exit."""
+    try:
+        lines = Path(f'/proc/{pid}/smaps_rollup').read_text().splitlines()[1:]
+    except OSError:
+        return {}
+    fields = {}
+    for line in lines:
+        name, _, value = line.partition(':')
+        fields[name] = int(value.split()[0]) * 1024
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'uss': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+        'shared': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+    }
+
+def _format_memory(usage: dict) -> str:
+    if not usage:
+        return 'memory n/a'
+    return ' '.join(f'{name} {value / MB:.1f}MB' for name, value in usage.items())
+
+def load_app():
+    from main import app
+    from fast_house_kg.api.predict import warm_model
+    # Modules the workers would otherwise import lazily are pulled in here so they are shared too.
+    import scipy.spatial
+    warm_model()
+    return app
+
+class WorkerServer(uvicorn.Server):
+    def __init__(self, config: uvicorn.Config, ready_fd: int, forked_at: float):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+        self.forked_at = forked_at
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets)
+        if self.started:
+            os.write(self.ready_fd, f'{time.monotonic() - self.forked_at:.6f}'.encode())
+            os.close(self.ready_fd)
+
+class Worker:
+    def __init__(self, pid: int, ready_fd: int, forked_at: float):
+        self.pid = pid
+        self.ready_fd: Optional[int] = ready_fd
+        self.forked_at = forked_at
+        self.ready_seconds: Optional[float] = None
+
+class Master:
+    def __init__(self, workers: int, host: str, port: int, preload: bool = True, log_level: str = 'info',
+                 report_interval: float = SERVER_MEMORY_REPORT_INTERVAL):
+        self.worker_count = workers
+        self.host = host
+        self.port = port
+        self.preload = preload
+        self.log_level = log_level
+        self.report_interval = report_interval
+        self.app = None
+        self.socket: Optional[socket.socket] = None
+        self.workers: Dict[int, Worker] = {}
+        self.stopping: Optional[int] = None
+        self.started_at = time.monotonic()
+        self.preload_seconds = 0.0
+        self.reported = False
+        self.last_report = 0.0
+
+    def bind(self):
+        self.socket = socket.socket(socket.AF_INET6 if ':' in self.host else socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((self.host, self.port))
+        self.socket.listen(SERVER_BACKLOG)
+        self.socket.set_inheritable(True)
+
+    def load(self):
+        start = time.monotonic()
+        # Collections during import would only churn pages; the survivors are frozen right before forking.
+        gc.disable()
+        self.app = load_app()
+        gc.collect()
+        self.preload_seconds = time.monotonic() - start
+
+    def spawn(self):
+        ready_fd, write_fd = os.pipe()
+        if self.preload:
+            # Frozen objects are never traversed by the collector, so workers' collections don't write to
+            # (and un-share) the pages holding them.
+            gc.freeze()
+        forked_at = time.monotonic()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_fd)
+            self._run_worker(write_fd, forked_at)
+        os.close(write_fd)
+        self.workers[pid] = Worker(pid, ready_fd, forked_at)
+
+    def _run_worker(self, ready_fd: int, forked_at: float):
+        status = 1
+        try:
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(signum, signal.SIG_DFL)
+            app = self.app if self.preload else load_app()
+            gc.enable()
+            from fast_house_kg.database.db import engines
+            # Pooled connections must not be shared with the master; nothing should be open yet, but be sure.
+            for db_engine in engines.values():
+                db_engine.sync_engine.dispose(close=False)
+            config = uvicorn.Config(app, log_level=self.log_level, lifespan='on')
+            WorkerServer(config, ready_fd, forked_at).run(sockets=[self.socket])
+            status = 0
+        except BaseException:
+            logger.exception('Worker %d failed.', os.getpid())
+        finally:
+            # Skip the master's atexit handlers and finalizers, which ran nothing in this process.
+            os._exit(status)
+
+    def _stop(self, signum, frame):
+        self.stopping = signum
+
+    def run(self) -> int:
+        if self.preload:
+            self.load()
+            logger.info('Loaded app and model in %.2fs (%s).', self.preload_seconds,
+                        _format_memory(memory_usage(os.getpid())))
+        self.bind()
+        logger.info('Listening on %s:%d with %d workers.', self.host, self.port, self.worker_count)
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for _ in range(self.worker_count):
+            self.spawn()
+        try:
+            while self.stopping is None:
+                self._wait_ready()
+                if not self._reap():
+                    return 1
+                if self.reported and self.report_interval and \
+                        time.monotonic() - self.last_report >= self.report_interval:
+                    self.report()
+        finally:
+            self.shutdown()
+        return 0
+
+    def _wait_ready(self):
+        pending = {worker.ready_fd: worker for worker in self.workers.values() if worker.ready_fd is not None}
+        try:
+            readable, _, _ = select.select(list(pending), [], [], 0.5) if pending else ([], [], [])
+        except InterruptedError:
+            return
+        if not pending:
+            time.sleep(0.5)
+        for fd in readable:
+            worker = pending[fd]
+            message = os.read(fd, 64)
+            os.close(fd)
+            worker.ready_fd = None
+            if message:
+                worker.ready_seconds = float(message)
+        if not self.reported and self.workers and all(worker.ready_seconds is not None
+                                                      for worker in self.workers.values()):
+            self.report(startup=True)
+
+    def _reap(self) -> bool:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return True
+            if pid == 0:
+                return True
+            worker = self.workers.pop(pid, None)
+            if worker is None or self.stopping is not None:
+                continue
+            if worker.ready_fd is not None:
+                os.close(worker.ready_fd)
+            if worker.ready_seconds is None:
+                logger.error('Worker %d exited with status %d before it was ready.', pid,
+                             os.waitstatus_to_exitcode(status))
+                return False
+            logger.warning('Worker %d exited with status %d, starting a new one.', pid,
+                           os.waitstatus_to_exitcode(status))
+            self.spawn()
+
+    def report(self, startup: bool = False):
+        self.reported = True
+        self.last_report = time.monotonic()
+        workers = sorted(self.workers.values(), key=lambda worker: worker.pid)
+        if startup:
+            ready = [worker.ready_seconds for worker in workers]
+            logger.info('Startup %.2fs: preload %.2fs, workers ready %.2f-%.2fs after fork.',
+                        time.monotonic() - self.started_at, self.preload_seconds, min(ready), max(ready))
+        logger.info('Master %d: %s', os.getpid(), _format_memory(memory_usage(os.getpid())))
+        unique = []
+        for worker in workers:
+            usage = memory_usage(worker.pid)
+            unique.append(usage.get('uss', 0))
+            logger.info('Worker %d: %s', worker.pid, _format_memory(usage))
+        if unique:
+            logger.info('Workers hold %.1fMB unique on average; %.1fMB in total.',
+                        sum(unique) / len(unique) / MB, sum(unique) / MB)
+
+    def shutdown(self):
+        signum = self.stopping or signal.SIGTERM
+        for pid in self.workers:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        while self.workers and time.monotonic() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                time.sleep(0.1)
+            else:
+                self.workers.pop(pid, None)
+        for pid in self.workers:
+            logger.warning('Worker %d did not stop in %ds, killing it.', pid, SHUTDOWN_TIMEOUT)
+            os.kill(pid, signal.SIGKILL)
+        if self.socket is not None:
+            self.socket.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the app from pre-forked workers sharing one loaded model.')
+    parser.add_argument('--workers', type=int, default=SERVER_WORKERS)
+    parser.add_argument('--host', default=SERVER_HOST)
+    parser.add_argument('--port', type=int, default=SERVER_PORT)
+    parser.add_argument('--log-level', default='info')
+    parser.add_argument('--report-interval', type=float, default=SERVER_MEMORY_REPORT_INTERVAL,
+                        help='seconds between per-worker memory reports, 0 reports once after startup')
+    parser.add_argument('--no-preload', dest='preload', action='store_false',
+                        help='import the app in each worker instead, for comparing memory')
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper(), format='%(asctime)s %(name)s %(levelname)s %(message)s')
+    master = Master(args.workers, args.host, args.port, args.preload, args.log_level, args.report_interval)
+    raise SystemExit(master.run())
+
+if __name__ == '__main__':
+    main()
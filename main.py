@@ -1,9 +1,38 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 import uvicorn
-from fast_house_kg.admin.setup import admin_setup
-from fast_house_kg.api import auth, users, city, district, property, review, predict
+from fast_house_kg.api import auth, users, city, district, property, review, predict, analytics, media
+from fast_house_kg.api.tokens import sweep_expired_tokens
+from fast_house_kg.api.reference import reference_caches
+from fast_house_kg.api.similar import refresh_similarity_index
+from fast_house_kg.config import ADMIN_ENABLED, METRICS_ENABLED, MODEL_WARMUP, QUERY_PROFILER_ENABLED
+from fast_house_kg.database.db import ReplicaStickinessMiddleware, engines
+from fast_house_kg.database.profiler import QueryProfilerMiddleware
+from fast_house_kg.database.rollups import refresh_price_rollups
+from fast_house_kg import metrics
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmups = [cache.warm() for cache in reference_caches.values()]
+    if MODEL_WARMUP != 'background':
+        warmups.append(predict.ensure_model())
+    await asyncio.gather(*warmups)
+    tasks = [asyncio.create_task(sweep_expired_tokens()), asyncio.create_task(refresh_price_rollups()),
+             asyncio.create_task(refresh_similarity_index()), asyncio.create_task(predict.follow_published_model())]
+    if MODEL_WARMUP == 'background':
+        # Serve at once; prediction routes wait on the same load if it hasn't finished.
+        tasks.append(asyncio.create_task(predict.ensure_model()))
+    yield
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    media.media_executor.shutdown(cancel_futures=True)
+    for engine in engines.values():
+        await engine.dispose()
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 app.include_router(predict.predict_router)
 app.include_router(auth.auth_router)
 app.include_router(users.users_router)
@@ -11,8 +40,25 @@ app.include_router(city.city_router)
 app.include_router(district.district_router)
 app.include_router(property.property_router)
 app.include_router(review.review_router)
+app.include_router(analytics.analytics_router)
+app.include_router(media.media_router)
+
+app.add_middleware(ReplicaStickinessMiddleware)
+
+if QUERY_PROFILER_ENABLED:
+    app.add_middleware(QueryProfilerMiddleware)
+
+if METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get('/metrics', include_in_schema=False)
+    async def metrics_endpoint():
+        return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
 
-admin_setup(app)
+if ADMIN_ENABLED:
+    # sqladmin and the admin views are only imported when the admin is mounted.
+    from fast_house_kg.admin.setup import admin_setup
+    admin_setup(app)
 
 if __name__ == '__main__':
     uvicorn.run('main:app', reload=True)
\ No newline at end of file
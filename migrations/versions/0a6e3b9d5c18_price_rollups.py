@@ -0,0 +1,58 @@
+"""price rollups
+
+Revision ID: 0a6e3b9d5c18
+Revises: f4a8c2e17b53
+Create Date: 2026-10-18 14:40:11.662803
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a6e3b9d5c18'
+down_revision: Union[str, Sequence[str], None] = 'f4a8c2e17b53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+region_enum = postgresql.ENUM(name='regionchoices', create_type=False)
+property_type_enum = postgresql.ENUM(name='propertychoices', create_type=False)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('price_rollup',
+    sa.Column('region', region_enum, nullable=False),
+    sa.Column('city_id', sa.Integer(), nullable=False),
+    sa.Column('district_id', sa.Integer(), nullable=False),
+    sa.Column('property_type', property_type_enum, nullable=False),
+    sa.Column('rooms', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('price_sum', sa.BigInteger(), nullable=False),
+    sa.Column('price_histogram', sa.JSON(), nullable=False),
+    sa.Column('area_count', sa.Integer(), nullable=False),
+    sa.Column('price_per_m2_sum', sa.Float(), nullable=False),
+    sa.Column('price_per_m2_histogram', sa.JSON(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('region', 'city_id', 'district_id', 'property_type', 'rooms')
+    )
+    op.create_table('price_rollup_dirty',
+    sa.Column('region', region_enum, nullable=False),
+    sa.Column('city_id', sa.Integer(), nullable=False),
+    sa.Column('district_id', sa.Integer(), nullable=False),
+    sa.Column('property_type', property_type_enum, nullable=False),
+    sa.Column('rooms', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('region', 'city_id', 'district_id', 'property_type', 'rooms')
+    )
+    # Mark every existing group dirty so the background job builds the initial rollups.
+    op.execute('INSERT INTO price_rollup_dirty (region, city_id, district_id, property_type, rooms) '
+               'SELECT DISTINCT region, city_id, district_id, property_type, rooms FROM property')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('price_rollup_dirty')
+    op.drop_table('price_rollup')
@@ -0,0 +1,42 @@
+"""property search indexes
+
+Revision ID: 3c1d9e8a7b21
+Revises: f937f9a144fd
+Create Date: 2026-10-18 10:12:41.218034
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1d9e8a7b21'
+down_revision: Union[str, Sequence[str], None] = 'f937f9a144fd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_property_region_type_price', 'property', ['region', 'property_type', 'price'], unique=False)
+    op.create_index('ix_property_city_district_price', 'property', ['city_id', 'district_id', 'price'], unique=False)
+    op.create_index('ix_property_district_rooms_price', 'property', ['district_id', 'rooms', 'price'], unique=False)
+    op.create_index('ix_property_type_rooms_price', 'property', ['property_type', 'rooms', 'price'], unique=False)
+    op.create_index('ix_property_price_id', 'property', ['price', 'id'], unique=False)
+    op.create_index('ix_property_area_id', 'property', ['area', 'id'], unique=False)
+    op.create_index('ix_property_created_date_id', 'property', ['created_date', 'id'], unique=False)
+    op.create_index('ix_property_seller_id', 'property', ['seller_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_property_seller_id', table_name='property')
+    op.drop_index('ix_property_created_date_id', table_name='property')
+    op.drop_index('ix_property_area_id', table_name='property')
+    op.drop_index('ix_property_price_id', table_name='property')
+    op.drop_index('ix_property_type_rooms_price', table_name='property')
+    op.drop_index('ix_property_district_rooms_price', table_name='property')
+    op.drop_index('ix_property_city_district_price', table_name='property')
+    op.drop_index('ix_property_region_type_price', table_name='property')
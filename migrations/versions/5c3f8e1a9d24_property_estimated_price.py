@@ -0,0 +1,32 @@
+"""property estimated price
+
+Revision ID: 5c3f8e1a9d24
+Revises: 0a6e3b9d5c18
+Create Date: 2026-10-18 15:12:27.408315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c3f8e1a9d24'
+down_revision: Union[str, Sequence[str], None] = '0a6e3b9d5c18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('property', sa.Column('estimated_price', sa.Float(), nullable=True))
+    op.add_column('property', sa.Column('model_version', sa.String(), nullable=True))
+    op.create_index(op.f('ix_property_model_version'), 'property', ['model_version'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_property_model_version'), table_name='property')
+    op.drop_column('property', 'model_version')
+    op.drop_column('property', 'estimated_price')
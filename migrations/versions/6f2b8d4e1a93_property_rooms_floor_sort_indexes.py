@@ -0,0 +1,30 @@
+"""property rooms floor sort indexes
+
+Revision ID: 6f2b8d4e1a93
+Revises: b1f6d3a8e245
+Create Date: 2026-10-19 09:14:27.603518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6f2b8d4e1a93'
+down_revision: Union[str, Sequence[str], None] = 'b1f6d3a8e245'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_property_rooms_id', 'property', ['rooms', 'id'], unique=False)
+    op.create_index('ix_property_floor_id', 'property', ['floor', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_property_floor_id', table_name='property')
+    op.drop_index('ix_property_rooms_id', table_name='property')
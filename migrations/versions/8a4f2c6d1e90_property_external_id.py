@@ -0,0 +1,30 @@
+"""property external id
+
+Revision ID: 8a4f2c6d1e90
+Revises: 3c1d9e8a7b21
+Create Date: 2026-10-18 11:02:17.504126
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a4f2c6d1e90'
+down_revision: Union[str, Sequence[str], None] = '3c1d9e8a7b21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('property', sa.Column('external_id', sa.String(), nullable=True))
+    op.create_unique_constraint('uq_property_seller_external_id', 'property', ['seller_id', 'external_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_property_seller_external_id', 'property', type_='unique')
+    op.drop_column('property', 'external_id')
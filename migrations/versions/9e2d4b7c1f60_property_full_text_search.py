@@ -0,0 +1,35 @@
+"""property full-text search
+
+Revision ID: 9e2d4b7c1f60
+Revises: 5c3f8e1a9d24
+Create Date: 2026-10-18 15:48:03.118724
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e2d4b7c1f60'
+down_revision: Union[str, Sequence[str], None] = '5c3f8e1a9d24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        "ALTER TABLE property ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(description, '')), 'B')) STORED"
+    )
+    op.create_index('ix_property_search_vector', 'property', ['search_vector'], unique=False,
+                    postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_property_search_vector', table_name='property', postgresql_using='gin')
+    op.drop_column('property', 'search_vector')
@@ -0,0 +1,48 @@
+"""property media
+
+Revision ID: b1f6d3a8e245
+Revises: 9e2d4b7c1f60
+Create Date: 2026-10-18 16:21:54.530117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b1f6d3a8e245'
+down_revision: Union[str, Sequence[str], None] = '9e2d4b7c1f60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('property_media',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('property_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.Enum('image', 'document', name='mediakindchoices'), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('content_type', sa.String(), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('filename', sa.String(), nullable=True),
+    sa.Column('width', sa.Integer(), nullable=True),
+    sa.Column('height', sa.Integer(), nullable=True),
+    sa.Column('variants', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['property_id'], ['property.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('property_id', 'sha256', name='uq_property_media_property_sha256')
+    )
+    op.create_index(op.f('ix_property_media_property_id'), 'property_media', ['property_id'], unique=False)
+    op.create_index(op.f('ix_property_media_sha256'), 'property_media', ['sha256'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_property_media_sha256'), table_name='property_media')
+    op.drop_index(op.f('ix_property_media_property_id'), table_name='property_media')
+    op.drop_table('property_media')
+    sa.Enum(name='mediakindchoices').drop(op.get_bind(), checkfirst=True)
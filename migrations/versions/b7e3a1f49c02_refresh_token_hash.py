@@ -0,0 +1,48 @@
+"""refresh token hash and expiry
+
+Revision ID: b7e3a1f49c02
+Revises: 8a4f2c6d1e90
+Create Date: 2026-10-18 11:48:05.377912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from fast_house_kg.config import REFRESH_TOKEN_LIFETIME
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e3a1f49c02'
+down_revision: Union[str, Sequence[str], None] = '8a4f2c6d1e90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('refresh_token', sa.Column('token_hash', sa.String(length=64), nullable=True))
+    op.add_column('refresh_token', sa.Column('expires_at', sa.DateTime(), nullable=True))
+    op.execute(
+        "UPDATE refresh_token SET token_hash = encode(sha256(convert_to(token, 'UTF8')), 'hex'), "
+        f"expires_at = created_date + interval '{REFRESH_TOKEN_LIFETIME} days'"
+    )
+    op.alter_column('refresh_token', 'token_hash', nullable=False)
+    op.alter_column('refresh_token', 'expires_at', nullable=False)
+    op.create_unique_constraint('refresh_token_token_hash_key', 'refresh_token', ['token_hash'])
+    op.create_index(op.f('ix_refresh_token_expires_at'), 'refresh_token', ['expires_at'], unique=False)
+    op.create_index(op.f('ix_refresh_token_user_id'), 'refresh_token', ['user_id'], unique=False)
+    op.drop_column('refresh_token', 'token')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Raw tokens cannot be recovered from their hashes, so outstanding sessions are dropped.
+    op.execute('DELETE FROM refresh_token')
+    op.add_column('refresh_token', sa.Column('token', sa.String(), nullable=False))
+    op.drop_index(op.f('ix_refresh_token_user_id'), table_name='refresh_token')
+    op.drop_index(op.f('ix_refresh_token_expires_at'), table_name='refresh_token')
+    op.drop_constraint('refresh_token_token_hash_key', 'refresh_token', type_='unique')
+    op.drop_column('refresh_token', 'expires_at')
+    op.drop_column('refresh_token', 'token_hash')
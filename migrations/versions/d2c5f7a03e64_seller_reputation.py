@@ -0,0 +1,46 @@
+"""seller reputation aggregates
+
+Revision ID: d2c5f7a03e64
+Revises: b7e3a1f49c02
+Create Date: 2026-10-18 12:31:52.860441
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2c5f7a03e64'
+down_revision: Union[str, Sequence[str], None] = 'b7e3a1f49c02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('seller_reputation',
+    sa.Column('seller_id', sa.Integer(), nullable=False),
+    sa.Column('rating_count', sa.Integer(), nullable=False),
+    sa.Column('rating_sum', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['seller_id'], ['user_profile.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('seller_id')
+    )
+    op.create_table('seller_rating_count',
+    sa.Column('seller_id', sa.Integer(), nullable=False),
+    sa.Column('rating', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['seller_id'], ['user_profile.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('seller_id', 'rating')
+    )
+    op.execute('INSERT INTO seller_reputation (seller_id, rating_count, rating_sum) '
+               'SELECT seller_id, count(*), sum(rating) FROM review GROUP BY seller_id')
+    op.execute('INSERT INTO seller_rating_count (seller_id, rating, count) '
+               'SELECT seller_id, rating, count(*) FROM review GROUP BY seller_id, rating')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('seller_rating_count')
+    op.drop_table('seller_reputation')
@@ -0,0 +1,28 @@
+"""price rollup dirty sequence
+
+Revision ID: d4a7c2e9f815
+Revises: 6f2b8d4e1a93
+Create Date: 2026-10-19 11:02:51.284907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a7c2e9f815'
+down_revision: Union[str, Sequence[str], None] = '6f2b8d4e1a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('price_rollup_dirty', sa.Column('sequence', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('price_rollup_dirty', 'sequence')
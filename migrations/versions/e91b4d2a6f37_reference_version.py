@@ -0,0 +1,32 @@
+"""reference data version counters
+
+Revision ID: e91b4d2a6f37
+Revises: d2c5f7a03e64
+Create Date: 2026-10-18 13:14:26.019385
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e91b4d2a6f37'
+down_revision: Union[str, Sequence[str], None] = 'd2c5f7a03e64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('reference_version',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('reference_version')
@@ -0,0 +1,32 @@
+"""property and review row versions
+
+Revision ID: f4a8c2e17b53
+Revises: e91b4d2a6f37
+Create Date: 2026-10-18 13:52:40.731256
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4a8c2e17b53'
+down_revision: Union[str, Sequence[str], None] = 'e91b4d2a6f37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('property', sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False))
+    op.add_column('property', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('review', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('review', 'version')
+    op.drop_column('property', 'version')
+    op.drop_column('property', 'updated_at')
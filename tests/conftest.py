@@ -0,0 +1,85 @@
+import os
+import tempfile
+
+# Settings are read when fast_house_kg.config is imported, so point the app at scratch storage first.
+_scratch = tempfile.mkdtemp(prefix='fast_house_kg_tests_')
+os.environ.setdefault('DATABASE_URL', f'sqlite+aiosqlite:///{_scratch}/app.db')
+os.environ.setdefault('SECRET_KEY', 'test')
+os.environ.setdefault('BCRYPT_ROUNDS', '4')
+os.environ.setdefault('ADMIN_ENABLED', 'false')
+os.environ.setdefault('MODEL_WARMUP', 'background')
+os.environ.setdefault('MEDIA_DIR', f'{_scratch}/media')
+
+from datetime import date
+import pytest
+from fastapi import Request
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+from fast_house_kg.database import db as database
+from fast_house_kg.database.db import Base, READ_METHODS, get_db
+from fast_house_kg.database.models import (City, District, UserProfile, PropertyChoices, RegionChoices,
+                                           ConditionChoices)
+
+PROPERTY = {
+    'title': 'Two-room flat', 'description': 'Renovated flat near the park.',
+    'property_type': PropertyChoices.apartment.value, 'region': RegionChoices.bishkek.value, 'city_id': 1,
+    'district_id': 1, 'address': 'Chui avenue 1', 'area': 60, 'price': 50000, 'rooms': 2, 'floor': 3,
+    'total_floors': 9, 'condition': ConditionChoices.good.value, 'images': '', 'documents': '', 'seller_id': 1,
+}
+
+def sqlite_url(path, driver: str = 'aiosqlite') -> str:
+    return f'sqlite+{driver}:///{path}' if driver else f'sqlite:///{path}'
+
+def create_database(path) -> None:
+    """Creates the schema, FTS triggers included, with one city, district and seller."""
+    engine = create_engine(sqlite_url(path, None))
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add_all([City(city_name='Bishkek'), District(district_name='Center'),
+                    UserProfile(username='seller', email='seller@example.com', password='x',
+                                data_registered=date(2026, 1, 1))])
+        db.commit()
+    engine.dispose()
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / 'primary.db'
+    create_database(path)
+    return path
+
+@pytest.fixture
+def db_engine(db_path, monkeypatch):
+    """aiosqlite stand-in for the primary. NullPool, since TestClient runs each request on its own loop."""
+    engine = create_async_engine(sqlite_url(db_path), poolclass=NullPool)
+    # Code that opens SessionLocal itself (exports, background refreshes) routes through database.engine.
+    monkeypatch.setattr(database, 'engine', engine)
+    monkeypatch.setattr(database, 'replica_engines', [])
+    yield engine
+    engine.sync_engine.dispose()
+
+@pytest.fixture
+def sessions(db_engine):
+    return async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+
+@pytest.fixture
+def app():
+    from main import app
+    yield app
+    app.dependency_overrides.clear()
+
+@pytest.fixture
+def client(app, sessions):
+    async def override_get_db(request: Request):
+        async with sessions(info={'read_only': request.method in READ_METHODS}) as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    # Not entered as a context manager: the lifespan's model load and background refreshes stay off.
+    return TestClient(app)
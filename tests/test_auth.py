@@ -0,0 +1,120 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+import pytest
+from fastapi import HTTPException
+from passlib.hash import bcrypt
+from sqlalchemy import select
+from fast_house_kg.api import auth, tokens
+from fast_house_kg.api.tokens import TokenCache, delete_expired_tokens, hash_token
+from fast_house_kg.config import BCRYPT_ROUNDS
+from fast_house_kg.database.models import UserProfile, UserProfileRefreshToken
+
+USER = {'username': 'buyer', 'password': 'secret1', 'email': 'buyer@example.com', 'status': 'Buyer'}
+
+def _rounds(password_hash: str) -> int:
+    return int(password_hash.split('$')[2])
+
+async def _add_user(sessions) -> int:
+    async with sessions() as db:
+        user = UserProfile(username=USER['username'], email=USER['email'], password=bcrypt.hash(USER['password']))
+        db.add(user)
+        await db.commit()
+        return user.id
+
+def _login(client) -> str:
+    response = client.post('/auth/login/', json={'username': USER['username'], 'password': USER['password']})
+    assert response.status_code == 200
+    return response.json()['refresh']
+
+@pytest.fixture
+def worker_cache(monkeypatch):
+    monkeypatch.setattr(tokens, 'REFRESH_REVOCATION_CHECK_INTERVAL', 0)
+    cache = TokenCache(100, 60)
+    monkeypatch.setattr(auth, 'token_cache', cache)
+    return cache
+
+@pytest.mark.anyio
+async def test_password_tasks_beyond_the_pending_limit_get_503(monkeypatch):
+    monkeypatch.setattr(auth, 'PASSWORD_HASH_MAX_PENDING', 2)
+    release = threading.Event()
+    running = [asyncio.ensure_future(auth.run_password_task(release.wait, 5)) for _ in range(2)]
+    await asyncio.sleep(0)
+    with pytest.raises(HTTPException) as raised:
+        await auth.run_password_task(bcrypt.hash, 'secret1')
+    assert raised.value.status_code == 503
+    assert raised.value.headers == {'Retry-After': '1'}
+    release.set()
+    assert await asyncio.gather(*running) == [True, True]
+    assert auth.password_pending == 0
+    assert await auth.run_password_task(len, 'free again') == 10
+
+def test_saturated_hashing_pool_rejects_register_and_login(client, monkeypatch):
+    monkeypatch.setattr(auth, 'password_pending', auth.PASSWORD_HASH_MAX_PENDING)
+    for path, body in (('/auth/register/', USER), ('/auth/login/', {'username': 'seller', 'password': 'x'})):
+        response = client.post(path, json=body)
+        assert response.status_code == 503, path
+        assert response.headers['retry-after'] == '1'
+
+@pytest.mark.anyio
+async def test_login_rehashes_a_password_with_another_cost(client, sessions):
+    stale = bcrypt.using(rounds=BCRYPT_ROUNDS + 1).hash(USER['password'])
+    async with sessions() as db:
+        db.add(UserProfile(username=USER['username'], email=USER['email'], password=stale))
+        await db.commit()
+    login = {'username': USER['username'], 'password': USER['password']}
+    assert client.post('/auth/login/', json=login).status_code == 200
+    async with sessions() as db:
+        rehashed = await db.scalar(select(UserProfile.password).where(UserProfile.username == USER['username']))
+    assert _rounds(rehashed) == BCRYPT_ROUNDS
+    assert bcrypt.verify(USER['password'], rehashed)
+    # Already at the configured cost: logging in again leaves the hash alone.
+    assert client.post('/auth/login/', json=login).status_code == 200
+    async with sessions() as db:
+        assert await db.scalar(select(UserProfile.password).where(UserProfile.username == USER['username'])) == rehashed
+    assert client.post('/auth/login/', json={**login, 'password': 'wrong1'}).status_code == 401
+
+@pytest.mark.anyio
+async def test_refresh_tokens_are_stored_and_looked_up_by_hash(client, sessions, worker_cache):
+    await _add_user(sessions)
+    refresh = _login(client)
+    async with sessions() as db:
+        stored = await db.scalar(select(UserProfileRefreshToken.token_hash))
+    assert stored == hash_token(refresh) != refresh
+    assert client.post('/auth/refresh/', params={'refresh_token': refresh}).status_code == 200
+    # A correctly signed token that was never stored is refused.
+    unknown = auth.create_refresh_token({'sub': USER['username']})
+    assert client.post('/auth/refresh/', params={'refresh_token': unknown}).status_code == 401
+
+@pytest.mark.anyio
+async def test_logout_revokes_the_token_in_every_worker(client, sessions, worker_cache, monkeypatch):
+    await _add_user(sessions)
+    refresh = _login(client)
+    other_worker = TokenCache(100, 60)
+    monkeypatch.setattr(auth, 'token_cache', other_worker)
+    assert client.post('/auth/refresh/', params={'refresh_token': refresh}).status_code == 200
+    assert other_worker.get(hash_token(refresh)) is not None
+    monkeypatch.setattr(auth, 'token_cache', worker_cache)
+    assert client.post('/auth/refresh/', params={'refresh_token': refresh}).status_code == 200
+    assert client.post('/auth/logout/', params={'refresh_token': refresh}).status_code == 200
+    assert client.post('/auth/refresh/', params={'refresh_token': refresh}).status_code == 401
+    # The other worker still holds the token as valid, but the revocation count makes it drop its cache.
+    monkeypatch.setattr(auth, 'token_cache', other_worker)
+    assert client.post('/auth/refresh/', params={'refresh_token': refresh}).status_code == 401
+    assert client.post('/auth/logout/', params={'refresh_token': refresh}).status_code == 401
+
+@pytest.mark.anyio
+async def test_sweeper_deletes_only_expired_tokens(db_engine, sessions, monkeypatch):
+    monkeypatch.setattr(tokens, 'TOKEN_SWEEP_BATCH', 2)
+    user_id = await _add_user(sessions)
+    now = datetime.utcnow()
+    async with sessions() as db:
+        db.add_all(UserProfileRefreshToken(user_id=user_id, token_hash=hash_token(f'token{i}'),
+                                           expires_at=now + timedelta(days=1 if i % 3 == 0 else -1))
+                   for i in range(7))
+        await db.commit()
+    assert await delete_expired_tokens(now) == 4
+    async with sessions() as db:
+        left = (await db.scalars(select(UserProfileRefreshToken.token_hash))).all()
+    assert sorted(left) == sorted(hash_token(f'token{i}') for i in (0, 3, 6))
+    assert await delete_expired_tokens(now) == 0
@@ -0,0 +1,36 @@
+import asyncio
+import pytest
+from pydantic import ValidationError
+from fast_house_kg.database.schema import HousePredictSchema
+from fast_house_kg.ml.batcher import PredictionBatcher
+
+HOUSE = {'GrLivArea': 1500, 'YearBuilt': 2000, 'GarageCars': 2, 'TotalBsmtSF': 800, 'FullBath': 2,
+         'OverallQual': 7, 'Neighborhood': 'CollgCr'}
+
+def _double(items):
+    # Fails the whole call for one bad item, like encoding a batch does.
+    return [float(item) * 2 for item in items]
+
+@pytest.mark.anyio
+async def test_one_failing_item_does_not_fail_its_batch():
+    batcher = PredictionBatcher(_double, max_batch_size=8, max_wait_ms=50)
+    results = await asyncio.gather(*(batcher.predict(item) for item in (1, 'bad', 3, 10 ** 400)),
+                                   return_exceptions=True)
+    assert results[0] == 2.0 and results[2] == 6.0
+    assert isinstance(results[1], ValueError) and isinstance(results[3], OverflowError)
+    assert batcher.largest_batch == 4
+
+@pytest.mark.anyio
+async def test_predict_each_returns_exceptions_in_place():
+    batcher = PredictionBatcher(_double)
+    results = await batcher.predict_each([1, 'bad', 3])
+    assert results[0] == 2.0 and results[2] == 6.0
+    assert isinstance(results[1], ValueError)
+    assert await batcher.predict_each([4]) == [8.0]
+
+@pytest.mark.parametrize('field, value', [('GrLivArea', 10 ** 400), ('GrLivArea', -1), ('OverallQual', 11),
+                                          ('YearBuilt', 99999), ('Neighborhood', 'x' * 100)])
+def test_house_fields_are_bounded(field, value):
+    with pytest.raises(ValidationError):
+        HousePredictSchema(**{**HOUSE, field: value})
+    HousePredictSchema(**HOUSE)
@@ -0,0 +1,29 @@
+import json
+from tests.conftest import PROPERTY
+
+def _ndjson(rows) -> bytes:
+    return b''.join(json.dumps(row).encode() + b'\n' for row in rows)
+
+def _bulk(client, rows, mode: str):
+    response = client.post('/property/bulk/', params={'mode': mode}, content=_ndjson(rows),
+                           headers={'content-type': 'application/x-ndjson'})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_upsert_keeps_the_last_duplicate_in_a_chunk(client):
+    rows = [{**PROPERTY, 'external_id': 'a', 'price': 1}, {**PROPERTY, 'external_id': 'b', 'price': 2},
+            {**PROPERTY, 'external_id': 'a', 'price': 3}]
+    result = _bulk(client, rows, 'upsert')
+    assert result['written'] == 2
+    assert [error['index'] for error in result['errors']] == [0]
+    prices = {item['external_id']: item['price'] for item in client.get('/property/').json()['items']}
+    assert prices == {'a': 3, 'b': 2}
+
+def test_failed_chunk_is_retried_row_by_row(client):
+    rows = [{**PROPERTY, 'external_id': 'a'}, {**PROPERTY, 'external_id': 'b'}, {**PROPERTY, 'external_id': 'a'},
+            {'title': 'missing fields'}]
+    result = _bulk(client, rows, 'insert')
+    assert result['received'] == 4
+    assert result['written'] == 2
+    assert [error['index'] for error in result['errors']] == [2, 3]
+    assert 'UNIQUE' in result['errors'][0]['errors'][0]
@@ -0,0 +1,45 @@
+import pytest
+from fastapi import Request
+from sqlalchemy import func, select
+from fast_house_kg.database.db import get_db
+from fast_house_kg.database.models import Property
+from tests.conftest import PROPERTY
+
+def _request(method: str) -> Request:
+    return Request({'type': 'http', 'method': method, 'headers': [], 'query_string': b''})
+
+@pytest.mark.anyio
+@pytest.mark.parametrize('method, read_only', [('GET', True), ('HEAD', True), ('POST', False), ('PUT', False)])
+async def test_get_db_marks_read_only_sessions(db_engine, method, read_only):
+    sessions = get_db(_request(method))
+    db = await sessions.__anext__()
+    assert db.info['read_only'] is read_only
+    await sessions.aclose()
+
+@pytest.mark.anyio
+async def test_async_session_round_trip(sessions):
+    async with sessions() as db:
+        db.add(Property(**PROPERTY))
+        await db.commit()
+    async with sessions() as db:
+        assert await db.scalar(select(func.count()).select_from(Property)) == 1
+        assert (await db.scalar(select(Property))).version == 1
+
+def test_create_then_read_property(client):
+    created = client.post('/property/', json=PROPERTY)
+    assert created.status_code == 200, created.text
+    property_id = created.json()['id']
+    detail = client.get(f'/property/{property_id}/')
+    assert detail.status_code == 200
+    assert detail.json()['title'] == PROPERTY['title']
+    assert detail.headers['etag'] == f'"{property_id}-1"'
+    assert client.get('/property/999/').status_code == 404
+
+def test_list_pages_with_cursor(client):
+    for price in (10, 20, 30):
+        assert client.post('/property/', json={**PROPERTY, 'price': price}).status_code == 200
+    first = client.get('/property/', params={'limit': 2}).json()
+    assert [item['price'] for item in first['items']] == [10, 20]
+    second = client.get('/property/', params={'limit': 2, 'after': first['next_cursor']}).json()
+    assert [item['price'] for item in second['items']] == [30]
+    assert second['next_cursor'] is None
@@ -0,0 +1,45 @@
+import io
+import pytest
+from fast_house_kg.api import media
+from tests.conftest import PROPERTY
+
+Image = pytest.importorskip('PIL.Image')
+
+PDF = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n1 0 obj <<>> endobj\ntrailer <<>>\n%%EOF\n'
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', (640, 480), (200, 120, 40)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+@pytest.fixture
+def property_id(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(media.media_store, 'root', tmp_path / 'media')
+    return client.post('/property/', json=PROPERTY).json()['id']
+
+def _stored(tmp_path) -> list:
+    return sorted(path.name for path in (tmp_path / 'media').rglob('*') if path.is_file())
+
+def test_pdf_upload_is_stored_as_a_document(client, property_id):
+    response = client.post(f'/media/property/{property_id}/', files=[('files', ('plan.pdf', PDF, 'application/pdf'))])
+    assert response.status_code == 200, response.text
+    assert response.json()[0]['kind'] == 'Document'
+
+def test_declared_pdf_without_pdf_magic_is_rejected(client, property_id, tmp_path):
+    response = client.post(f'/media/property/{property_id}/',
+                           files=[('files', ('plan.pdf', b'<html>not a pdf</html>', 'application/pdf'))])
+    assert response.status_code == 415
+    assert _stored(tmp_path) == []
+
+def test_failed_upload_removes_files_stored_earlier_in_the_request(client, property_id, tmp_path, monkeypatch):
+    monkeypatch.setattr(media, 'MEDIA_MAX_BYTES', 64 * 1024)
+    image = _png()
+    assert len(image) < media.MEDIA_MAX_BYTES
+    response = client.post(f'/media/property/{property_id}/', files=[
+        ('files', ('front.png', image, 'image/png')),
+        ('files', ('plan.pdf', PDF, 'application/pdf')),
+        ('files', ('huge.pdf', PDF + b'0' * media.MEDIA_MAX_BYTES, 'application/pdf')),
+    ])
+    assert response.status_code == 413
+    assert _stored(tmp_path) == []
+    assert client.get(f'/media/property/{property_id}/').json() == []
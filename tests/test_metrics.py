@@ -0,0 +1,22 @@
+from concurrent.futures import ThreadPoolExecutor
+from fast_house_kg import metrics
+from fast_house_kg.api import predict  # registers the predict_* metrics
+
+def _family(name: str) -> str:
+    return next(metric.render() for metric in metrics.metrics if metric.name == name)
+
+def test_monotonic_predict_metrics_are_counters():
+    assert '# TYPE predict_batches_total counter' in _family('predict_batches_total')
+    assert '# TYPE predict_cache_events_total counter' in _family('predict_cache_events_total')
+    assert '# TYPE predict_queue_depth gauge' in _family('predict_queue_depth')
+
+def test_histogram_observe_is_thread_safe():
+    histogram = metrics.Histogram('test_thread_seconds', 'Observed from many threads.')
+    try:
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(lambda _: [histogram.observe(0.001) for _ in range(5000)], range(8)))
+        samples = {suffix: value for suffix, _, _, value in histogram.samples() if suffix != '_bucket'}
+        assert samples['_count'] == 40000
+        assert abs(samples['_sum'] - 40) < 1e-6
+    finally:
+        metrics.metrics.remove(histogram)
@@ -0,0 +1,101 @@
+import json
+import os
+import joblib
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import StandardScaler
+from fast_house_kg.api import predict
+from fast_house_kg.database.schema import HousePredictSchema
+from fast_house_kg.ml.cache import PredictionCache, SQLiteCacheBackend
+from fast_house_kg.ml.features import FEATURE_COUNT
+from fast_house_kg.ml.registry import MODEL_FILE, SCALER_FILE, ModelRegistry
+from tests.test_batcher import HOUSE
+
+@pytest.fixture
+def client(app):
+    return TestClient(app)
+
+def _houses(*areas) -> list:
+    return [{**HOUSE, 'GrLivArea': area} for area in areas]
+
+def _single(client, house) -> float:
+    response = client.post('/predict/', json=house)
+    assert response.status_code == 200, response.text
+    return response.json()['Price predict']
+
+def test_batch_results_follow_input_order(client):
+    houses = _houses(2400, 800, 1500, 3000)
+    response = client.post('/predict/batch/', json=houses)
+    assert response.status_code == 200, response.text
+    results = response.json()
+    assert [result['index'] for result in results] == [0, 1, 2, 3]
+    expected = [_single(client, house) for house in houses]
+    assert [result['Price predict'] for result in results] == pytest.approx(expected)
+
+def test_invalid_rows_fail_alone(client):
+    rows = [HOUSE, {'GrLivArea': 1500}, {**HOUSE, 'GrLivArea': 10 ** 400}, {**HOUSE, 'OverallQual': 8}]
+    results = client.post('/predict/batch/', json=rows).json()
+    assert [result['index'] for result in results] == [0, 1, 2, 3]
+    assert 'Price predict' in results[0] and 'Price predict' in results[3]
+    assert {error['loc'][0] for error in results[1]['errors']} >= {'YearBuilt', 'Neighborhood'}
+    assert results[2]['errors'][0]['loc'] == ['GrLivArea']
+
+def test_prediction_failure_is_reported_for_its_row_only(client, monkeypatch):
+    predict_fn = predict.batcher.predict_fn
+
+    def failing(houses):
+        if any(house.GrLivArea == 4242 for house in houses):
+            raise ValueError('cannot score this house')
+        return predict_fn(houses)
+
+    monkeypatch.setattr(predict.batcher, 'predict_fn', failing)
+    results = client.post('/predict/batch/', json=_houses(1111, 4242, 1212)).json()
+    assert [result['index'] for result in results] == [0, 1, 2]
+    assert results[1]['errors'] == [{'type': 'prediction_failed', 'msg': 'cannot score this house'}]
+    assert 'Price predict' in results[0] and 'Price predict' in results[2]
+
+def test_ndjson_rows_keep_their_line_order(client):
+    lines = [json.dumps(house) for house in _houses(1300, 1700)]
+    body = '\n'.join([lines[0], '{"GrLivArea": 1}', '', lines[1]]) + '\n'
+    response = client.post('/predict/batch/', content=body, headers={'content-type': 'application/x-ndjson'})
+    assert response.status_code == 200, response.text
+    results = response.json()
+    assert [result['index'] for result in results] == [0, 1, 2]
+    assert 'errors' in results[1]
+    assert results[2]['Price predict'] == pytest.approx(_single(client, _houses(1700)[0]))
+
+def test_ndjson_with_invalid_json_is_rejected(client):
+    response = client.post('/predict/batch/', content='{"GrLivArea": 1}\n{oops\n',
+                           headers={'content-type': 'application/x-ndjson'})
+    assert response.status_code == 400
+    assert response.json()['detail'] == 'Invalid JSON on line 2.'
+
+def _save_model(directory, coef: float):
+    directory.mkdir(parents=True, exist_ok=True)
+    features = np.random.default_rng(0).uniform(0, 3000, (50, FEATURE_COUNT))
+    scaler = StandardScaler().fit(features)
+    model = LinearRegression().fit(scaler.transform(features), features[:, 0] * coef)
+    joblib.dump(model, directory / MODEL_FILE)
+    joblib.dump(scaler, directory / SCALER_FILE)
+
+def test_reloaded_version_is_not_served_from_the_shared_cache(tmp_path, monkeypatch):
+    _save_model(tmp_path / 'models' / 'v1', 10.0)
+    registry = ModelRegistry(tmp_path / 'models', mmap=False)
+    monkeypatch.setattr(predict, 'registry', registry)
+    shared = str(tmp_path / 'cache.sqlite')
+    monkeypatch.setattr(predict, 'cache', PredictionCache(shared=SQLiteCacheBackend(shared, 3600)))
+    house = HousePredictSchema(**HOUSE)
+    registry.activate('v1')
+    assert predict.predict_houses([house])[0] == pytest.approx(15000)
+
+    _save_model(tmp_path / 'models' / 'v1', 20.0)
+    # Same-second rewrites can keep the mtime; move it so the registry sees the change.
+    model_path = tmp_path / 'models' / 'v1' / MODEL_FILE
+    stat = model_path.stat()
+    os.utime(model_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    registry.activate('v1')
+    # Another worker: empty in-process cache, same shared store.
+    monkeypatch.setattr(predict, 'cache', PredictionCache(shared=SQLiteCacheBackend(shared, 3600)))
+    assert predict.predict_houses([house])[0] == pytest.approx(30000)
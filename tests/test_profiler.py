@@ -0,0 +1,24 @@
+import pytest
+from fast_house_kg.database.profiler import fingerprint, normalize
+
+@pytest.mark.parametrize('statements', [
+    ['SELECT * FROM property WHERE id IN (?)', 'SELECT * FROM property WHERE id IN (?, ?)',
+     'SELECT * FROM property WHERE id IN (?,?,?)'],
+    ['SELECT * FROM property WHERE id IN (%s)', 'SELECT * FROM property WHERE id IN (%s, %s, %s)'],
+    ['SELECT * FROM property WHERE id IN (%(id_1_1)s, %(id_1_2)s)', 'SELECT * FROM property WHERE id IN (%(id_1_1)s)'],
+    ['SELECT * FROM property WHERE id IN ($1, $2)', 'SELECT * FROM property WHERE id IN ($1, $2, $3)',
+     'SELECT * FROM property WHERE id IN ($4)'],
+    ['SELECT * FROM property WHERE id IN (1, 2)', 'SELECT * FROM property WHERE id IN (3, 4.5, 6)'],
+    ["SELECT * FROM property WHERE title IN ('a', 'b')", "SELECT * FROM property WHERE title IN ('it''s')"],
+], ids=['qmark', 'format', 'pyformat', 'numeric', 'numbers', 'strings'])
+def test_in_lists_of_any_length_share_a_fingerprint(statements):
+    assert len({normalize(statement) for statement in statements}) == 1
+    assert len({fingerprint(statement) for statement in statements}) == 1
+
+def test_normalize_replaces_literals_and_placeholders():
+    assert normalize('SELECT  *\n FROM property WHERE id = $12 AND price > 100 AND title = \'x\'') == \
+        'SELECT * FROM property WHERE id = $? AND price > ? AND title = ?'
+    assert normalize('SELECT * FROM property WHERE id = $1') == normalize('SELECT * FROM property WHERE id = $2')
+
+def test_different_tables_stay_distinct():
+    assert fingerprint('SELECT * FROM property WHERE id IN ($1)') != fingerprint('SELECT * FROM review WHERE id IN ($1)')
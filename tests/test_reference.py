@@ -0,0 +1,48 @@
+import sqlite3
+import pytest
+from fast_house_kg.api import reference
+from fast_house_kg.api.reference import city_cache, district_cache
+
+REFERENCES = [('/city/', 'city_name', city_cache), ('/district/', 'district_name', district_cache)]
+
+@pytest.fixture(autouse=True)
+def cold_caches():
+    # The caches are module-level and would otherwise keep rows from another test's database.
+    for cache in reference.reference_caches.values():
+        cache.expire()
+    yield
+    for cache in reference.reference_caches.values():
+        cache.expire()
+
+def _names(client, path: str, column: str) -> list:
+    response = client.get(path)
+    assert response.status_code == 200
+    return [item[column] for item in response.json()['items']]
+
+@pytest.mark.parametrize('path, column, cache', REFERENCES)
+def test_writes_invalidate_the_cached_list(client, path, column, cache):
+    before = _names(client, path, column)
+    created = client.post(path, json={column: 'Karakol'}).json()['id']
+    assert _names(client, path, column) == before + ['Karakol']
+    assert client.get(f'{path}{created}/').json()[column] == 'Karakol'
+
+    assert client.put(f'{path}{created}/', json={column: 'Naryn'}).status_code == 200
+    assert _names(client, path, column) == before + ['Naryn']
+    assert client.get(f'{path}{created}/').json()[column] == 'Naryn'
+
+    assert client.delete(f'{path}{created}/').status_code == 200
+    assert _names(client, path, column) == before
+    assert client.get(f'{path}{created}/').status_code == 404
+
+@pytest.mark.parametrize('path, column, cache', REFERENCES)
+def test_another_workers_write_is_seen_after_the_check_interval(client, db_path, monkeypatch, path, column, cache):
+    before = _names(client, path, column)
+    # Another worker's commit leaves only the new row and the bumped version behind; this worker's cache
+    # never saw the after_commit event.
+    with sqlite3.connect(db_path) as writer:
+        writer.execute(f'INSERT INTO {cache.name} ({column}) VALUES (?)', ('Talas',))
+        writer.execute('INSERT INTO reference_version (name, version) VALUES (?, 1) '
+                       'ON CONFLICT (name) DO UPDATE SET version = version + 1', (cache.name,))
+    assert _names(client, path, column) == before
+    monkeypatch.setattr(reference, 'REFCACHE_CHECK_INTERVAL', 0)
+    assert _names(client, path, column) == before + ['Talas']
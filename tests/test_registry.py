@@ -0,0 +1,64 @@
+import os
+import joblib
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import StandardScaler
+from fast_house_kg.ml.registry import MODEL_FILE, SCALER_FILE, ModelRegistry, version_key
+
+def _save(directory, coef: float):
+    directory.mkdir(parents=True, exist_ok=True)
+    features = np.arange(10, dtype=float).reshape(-1, 1)
+    scaler = StandardScaler().fit(features)
+    model = LinearRegression().fit(scaler.transform(features), features[:, 0] * coef)
+    joblib.dump(model, directory / MODEL_FILE)
+    joblib.dump(scaler, directory / SCALER_FILE)
+
+def test_version_key_orders_numbers_naturally():
+    assert sorted(['v10', 'v9', 'v2', 'v1.10', 'v1.9'], key=version_key) == ['v1.9', 'v1.10', 'v2', 'v9', 'v10']
+
+def test_activate_picks_the_naturally_latest_version(tmp_path):
+    for version in ('v2', 'v9', 'v10'):
+        _save(tmp_path / version, 1.0)
+    registry = ModelRegistry(tmp_path, mmap=False)
+    assert registry.available() == ['v2', 'v9', 'v10']
+    assert registry.activate().version == 'v10'
+
+def test_reactivating_reloads_changed_files(tmp_path):
+    _save(tmp_path / 'v1', 1.0)
+    _save(tmp_path / 'v2', 1.0)
+    registry = ModelRegistry(tmp_path, mmap=False)
+    first = registry.activate('v1')
+    assert registry.activate('v1') is first
+    _save(tmp_path / 'v1', 3.0)
+    # Same-second rewrites can keep the mtime; the size check alone isn't enough for equal-sized pickles.
+    stat = (tmp_path / 'v1' / MODEL_FILE).stat()
+    os.utime(tmp_path / 'v1' / MODEL_FILE, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    reloaded = registry.activate('v1')
+    assert reloaded is not first
+    assert reloaded.predict([[5.0]])[0] == pytest.approx(15.0)
+    assert registry.previous is None
+
+@pytest.mark.parametrize('version', ['..', '../v1', '/etc', 'v1/../v2', '.hidden', ''])
+def test_versions_outside_the_model_dir_are_rejected(tmp_path, version):
+    _save(tmp_path / 'models' / 'v1', 1.0)
+    _save(tmp_path / 'v1', 1.0)
+    registry = ModelRegistry(tmp_path / 'models', mmap=False)
+    with pytest.raises(KeyError):
+        registry.activate(version)
+
+def test_published_version_is_activated_by_every_registry(tmp_path):
+    for version in ('v1', 'v2'):
+        _save(tmp_path / version, 1.0)
+    handling, other = ModelRegistry(tmp_path, mmap=False), ModelRegistry(tmp_path, mmap=False)
+    handling.activate('v1')
+    other.activate('v1')
+    assert other.sync() is None
+    handling.publish(handling.activate('v2').version)
+    assert handling.sync() is None
+    assert other.sync().version == 'v2'
+    assert other.sync() is None
+    # A rollback is published the same way.
+    handling.publish(handling.rollback().version)
+    assert other.sync().version == 'v1'
+    assert ModelRegistry(tmp_path, mmap=False).sync().version == 'v1'
@@ -0,0 +1,76 @@
+import time
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from fast_house_kg.database import db as database
+from fast_house_kg.database.db import LAST_WRITE_COOKIE
+from tests.conftest import PROPERTY, create_database, sqlite_url
+
+@pytest.fixture
+def replica(db_engine, tmp_path, monkeypatch):
+    """A second SQLite file as the only replica. It never receives the primary's writes, so any read
+    routed to it misses rows written through the API."""
+    path = tmp_path / 'replica.db'
+    create_database(path)
+    engine = create_async_engine(sqlite_url(path), poolclass=NullPool)
+    monkeypatch.setattr(database, 'replica_engines', [engine])
+    yield engine
+    engine.sync_engine.dispose()
+
+@pytest.fixture
+def used(db_engine, replica):
+    """Names of the engines each request ran statements on, cleared by the test between requests."""
+    engines = set()
+    listeners = [(db_engine, lambda *args: engines.add('primary')), (replica, lambda *args: engines.add('replica'))]
+    for engine, listener in listeners:
+        event.listen(engine.sync_engine, 'before_cursor_execute', listener)
+    yield engines
+    for engine, listener in listeners:
+        event.remove(engine.sync_engine, 'before_cursor_execute', listener)
+
+@pytest.fixture
+def client(app, replica):
+    # The real get_db, so requests go through RoutingSession.
+    return TestClient(app)
+
+def test_writes_go_to_the_primary_and_reads_to_the_replica(client, used):
+    created = client.post('/property/', json=PROPERTY)
+    assert created.status_code == 200, created.text
+    assert used == {'primary'}
+    client.cookies.clear()
+    used.clear()
+    assert client.get(f'/property/{created.json()["id"]}/').status_code == 404
+    assert used == {'replica'}
+
+def test_reads_stick_to_the_primary_after_a_write(client, used, monkeypatch):
+    created = client.post('/property/', json=PROPERTY)
+    assert LAST_WRITE_COOKIE in created.cookies
+    used.clear()
+    assert client.get(f'/property/{created.json()["id"]}/').status_code == 200
+    assert client.get('/property/export/').text.count('\n') == 1
+    assert used == {'primary'}
+    # Once the lag window has passed, reads go back to the replica.
+    monkeypatch.setattr(database, 'DB_REPLICA_STICKY_SECONDS', 0.0)
+    used.clear()
+    assert client.get(f'/property/{created.json()["id"]}/').status_code == 404
+    assert used == {'replica'}
+
+@pytest.mark.parametrize('value', ['', 'garbage', str(time.time() + 3600)])
+def test_unusable_last_write_cookie_reads_from_the_replica(client, used, value):
+    client.cookies.set(LAST_WRITE_COOKIE, value)
+    assert client.get('/property/export/').status_code == 200
+    assert used == {'replica'}
+
+def test_exports_read_from_the_replica(client, used):
+    assert client.post('/property/', json=PROPERTY).status_code == 200
+    client.cookies.clear()
+    used.clear()
+    assert client.get('/property/export/').text == ''
+    assert client.get('/property/export/', params={'format': 'csv'}).text.count('\n') == 1
+    assert used == {'replica'}
+
+def test_no_cookie_without_replicas(client, monkeypatch):
+    monkeypatch.setattr(database, 'replica_engines', [])
+    assert LAST_WRITE_COOKIE not in client.post('/property/', json=PROPERTY).cookies
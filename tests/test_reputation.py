@@ -0,0 +1,50 @@
+import pytest
+from sqlalchemy import func, select
+from fast_house_kg.database.models import Review, UserProfile
+
+def _reputation(client, seller_id: int) -> dict:
+    response = client.get(f'/users/{seller_id}/reputation/')
+    assert response.status_code == 200
+    body = response.json()
+    return {key: body[key] for key in ('rating_count', 'rating_sum', 'histogram')}
+
+async def _recount(sessions, seller_id: int) -> dict:
+    async with sessions() as db:
+        ratings = (await db.execute(select(Review.rating, func.count()).where(Review.seller_id == seller_id)
+                                    .group_by(Review.rating).order_by(Review.rating))).all()
+    return {'rating_count': sum(count for _, count in ratings),
+            'rating_sum': sum(rating * count for rating, count in ratings),
+            'histogram': {str(rating): count for rating, count in ratings}}
+
+async def _assert_matches_reviews(client, sessions, *seller_ids: int):
+    for seller_id in seller_ids:
+        assert _reputation(client, seller_id) == await _recount(sessions, seller_id)
+
+@pytest.mark.anyio
+async def test_reputation_follows_review_create_update_and_delete(client, sessions):
+    async with sessions() as db:
+        db.add_all([UserProfile(username='buyer', email='buyer@example.com', password='x'),
+                    UserProfile(username='seller2', email='seller2@example.com', password='x')])
+        await db.commit()
+    review = {'buyer_id': 2, 'seller_id': 1, 'rating': 4, 'comment': 'ok'}
+    first = client.post('/review/', json=review).json()['id']
+    second = client.post('/review/', json={**review, 'rating': 8}).json()['id']
+    assert _reputation(client, 1) == {'rating_count': 2, 'rating_sum': 12, 'histogram': {'4': 1, '8': 1}}
+
+    # Changing only the comment leaves the aggregates alone.
+    assert client.put(f'/review/{first}/', json={**review, 'comment': 'fine'}).status_code == 200
+    assert _reputation(client, 1)['rating_sum'] == 12
+    assert client.put(f'/review/{first}/', json={**review, 'rating': 6}).status_code == 200
+    assert _reputation(client, 1) == {'rating_count': 2, 'rating_sum': 14, 'histogram': {'6': 1, '8': 1}}
+
+    # Moving a review to another seller takes its old rating off the first one.
+    assert client.put(f'/review/{second}/', json={**review, 'seller_id': 3, 'rating': 9}).status_code == 200
+    assert _reputation(client, 1) == {'rating_count': 1, 'rating_sum': 6, 'histogram': {'6': 1}}
+    assert _reputation(client, 3) == {'rating_count': 1, 'rating_sum': 9, 'histogram': {'9': 1}}
+    await _assert_matches_reviews(client, sessions, 1, 3)
+
+    assert client.delete(f'/review/{first}/').status_code == 200
+    assert _reputation(client, 1) == {'rating_count': 0, 'rating_sum': 0, 'histogram': {}}
+    assert client.get('/users/1/reputation/').json()['average'] is None
+    assert client.delete(f'/review/{second}/').status_code == 200
+    await _assert_matches_reviews(client, sessions, 1, 3)
@@ -0,0 +1,61 @@
+import subprocess
+import sys
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from sqlalchemy import select, update
+from fast_house_kg.database.models import JobLock, Property
+from fast_house_kg.ml.revalue import LOCK_NAME, SCAN_COLUMNS, RevalueRunning, revalue_properties, write_stmt
+from tests.conftest import PROPERTY
+
+class FlatModel:
+    version = 'flat'
+
+    def predict(self, features):
+        return np.full(len(features), 1000.0)
+
+async def _add_properties(sessions, count: int):
+    async with sessions() as db:
+        db.add_all([Property(**PROPERTY) for _ in range(count)])
+        await db.commit()
+
+def test_features_do_not_import_models():
+    code = 'import sys, fast_house_kg.ml.features; assert "fast_house_kg.database.models" not in sys.modules'
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+@pytest.mark.anyio
+async def test_write_returns_only_rows_still_at_the_read_version(sessions):
+    await _add_properties(sessions, 3)
+    async with sessions() as db:
+        rows = (await db.execute(select(*SCAN_COLUMNS).order_by(Property.id))).all()
+        await db.execute(update(Property).where(Property.id == 2).values(version=Property.version + 1))
+        written = (await db.execute(write_stmt(rows, [1.0, 2.0, 3.0], 'flat'))).scalars().all()
+        await db.commit()
+        assert sorted(written) == [1, 3]
+        prices = (await db.execute(select(Property.estimated_price).order_by(Property.id))).scalars().all()
+        assert prices == [1.0, None, 3.0]
+
+@pytest.mark.anyio
+async def test_revalue_counts_written_rows_and_releases_the_lock(sessions, tmp_path):
+    await _add_properties(sessions, 5)
+    progress = await revalue_properties(FlatModel(), workers=0, chunk_size=2, checkpoint=tmp_path / 'checkpoint.json')
+    assert (progress['scanned'], progress['written'], progress['skipped'], progress['chunks']) == (5, 5, 0, 3)
+    async with sessions() as db:
+        assert await db.scalar(select(JobLock)) is None
+        assert set((await db.execute(select(Property.model_version))).scalars()) == {'flat'}
+
+@pytest.mark.anyio
+async def test_a_second_run_is_refused_while_the_lock_is_held(sessions, tmp_path):
+    await _add_properties(sessions, 1)
+    async with sessions() as db:
+        db.add(JobLock(name=LOCK_NAME, owner='cli', expires_at=datetime.utcnow() + timedelta(minutes=5)))
+        await db.commit()
+    with pytest.raises(RevalueRunning, match='cli'):
+        await revalue_properties(FlatModel(), workers=0, checkpoint=tmp_path / 'checkpoint.json')
+    async with sessions() as db:
+        assert await db.scalar(select(Property.model_version)) is None
+        # A lock its holder stopped renewing lapses.
+        await db.execute(update(JobLock).values(expires_at=datetime.utcnow() - timedelta(seconds=1)))
+        await db.commit()
+    progress = await revalue_properties(FlatModel(), workers=0, checkpoint=tmp_path / 'checkpoint.json')
+    assert progress['written'] == 1
@@ -0,0 +1,51 @@
+import sqlite3
+import pytest
+from sqlalchemy import event, select
+from fast_house_kg.database.models import PriceRollup, PriceRollupDirty, Property, rollup_dirty_stmt
+from fast_house_kg.database.rollups import refresh_dirty_rollups
+from tests.conftest import PROPERTY
+
+async def _dirty(sessions) -> list:
+    async with sessions() as db:
+        return (await db.execute(select(PriceRollupDirty.rooms, PriceRollupDirty.sequence))).all()
+
+@pytest.mark.anyio
+async def test_marking_a_dirty_key_again_bumps_its_sequence(sessions):
+    async with sessions() as db:
+        db.add(Property(**PROPERTY))
+        await db.commit()
+        key = ('Bishkek', 1, 1, 'Apartment', 2)
+        await db.execute(rollup_dirty_stmt('sqlite', [key]))
+        await db.commit()
+    assert await _dirty(sessions) == [(2, 2)]
+
+@pytest.mark.anyio
+async def test_refresh_keeps_keys_marked_while_it_aggregates(sessions, db_engine, db_path):
+    async with sessions() as db:
+        db.add(Property(**PROPERTY))
+        await db.commit()
+
+    def mark_concurrently(connection, cursor, statement, parameters, context, executemany):
+        if statement.startswith('SELECT property.region'):
+            # Another writer commits a change to the same key between our read of the marks and their delete.
+            with sqlite3.connect(db_path) as writer:
+                writer.execute('INSERT INTO property (title, description, property_type, region, city_id, district_id, '
+                               'address, area, price, rooms, floor, total_floors, condition, images, documents, '
+                               "seller_id, created_date, updated_at) SELECT title, description, property_type, region, "
+                               'city_id, district_id, address, area, price * 3, rooms, floor, total_floors, condition, '
+                               'images, documents, seller_id, created_date, updated_at FROM property')
+                writer.execute('UPDATE price_rollup_dirty SET sequence = sequence + 1')
+
+    event.listen(db_engine.sync_engine, 'before_cursor_execute', mark_concurrently)
+    try:
+        async with sessions() as db:
+            assert await refresh_dirty_rollups(db) == 1
+    finally:
+        event.remove(db_engine.sync_engine, 'before_cursor_execute', mark_concurrently)
+    assert await _dirty(sessions) == [(2, 2)]
+
+    async with sessions() as db:
+        assert await refresh_dirty_rollups(db) == 1
+        assert await refresh_dirty_rollups(db) == 0
+        assert (await db.scalar(select(PriceRollup))).count == 2
+    assert await _dirty(sessions) == []
@@ -0,0 +1,152 @@
+"""Query plans for every /property/search/ filter and sort shape use the indexes added for them.
+
+SQLite plans the statements the endpoint actually runs. Postgres plans the same statements when
+TEST_POSTGRES_URL points at a scratch database (tables are created and dropped there).
+/property/search/text/ is tested against the SQLite FTS5 table and its sync triggers.
+"""
+import inspect
+import os
+import sqlite3
+import typing
+import pytest
+from sqlalchemy import create_engine, event, select, text
+from fast_house_kg.api.filters import PropertyFilter, PropertySort
+from fast_house_kg.api.pagination import PageParams, encode_cursor, keyset
+from fast_house_kg.api.property import EXPORT_COLUMNS
+from fast_house_kg.database.db import Base
+from fast_house_kg.database.models import City
+from tests.conftest import PROPERTY
+
+# (query string, index expected in the plan, whether that index also delivers the sort order)
+SHAPES = [
+    ({}, None, True),
+    ({'sort': 'price'}, 'ix_property_price_id', True),
+    ({'sort': '-price'}, 'ix_property_price_id', True),
+    ({'sort': 'price', 'after': encode_cursor([50000, 7])}, 'ix_property_price_id', True),
+    ({'sort': 'area'}, 'ix_property_area_id', True),
+    ({'sort': '-area'}, 'ix_property_area_id', True),
+    ({'sort': 'rooms'}, 'ix_property_rooms_id', True),
+    ({'sort': '-rooms'}, 'ix_property_rooms_id', True),
+    ({'sort': 'floor'}, 'ix_property_floor_id', True),
+    ({'sort': '-floor'}, 'ix_property_floor_id', True),
+    ({'sort': 'created_date'}, 'ix_property_created_date_id', True),
+    ({'sort': '-created_date'}, 'ix_property_created_date_id', True),
+    ({'region': 'Bishkek'}, 'ix_property_region_type_price', False),
+    ({'region': 'Bishkek', 'property_type': 'Apartment'}, 'ix_property_region_type_price', False),
+    ({'region': 'Bishkek', 'property_type': 'Apartment', 'price_min': 1000, 'price_max': 90000, 'sort': 'price'},
+     'ix_property_region_type_price', True),
+    ({'city_id': 1, 'district_id': 1}, 'ix_property_city_district_price', False),
+    ({'city_id': 1, 'district_id': 1, 'sort': '-price'}, 'ix_property_city_district_price', True),
+    ({'district_id': 1, 'rooms_min': 2, 'rooms_max': 3}, 'ix_property_district_rooms_price', False),
+    ({'property_type': 'Apartment', 'rooms_min': 2, 'rooms_max': 3}, 'ix_property_type_rooms_price', False),
+    ({'price_min': 1000, 'price_max': 90000}, 'ix_property_price_id', False),
+    ({'price_min': 1000, 'sort': 'price'}, 'ix_property_price_id', True),
+    ({'area_min': 40, 'area_max': 80, 'sort': 'area'}, 'ix_property_area_id', True),
+]
+SHAPE_IDS = ['&'.join(f'{name}={value}' for name, value in query.items()) or 'default' for query, _, _ in SHAPES]
+
+FILTER_TYPES = {name: typing.get_args(parameter.annotation)[0]
+                for name, parameter in inspect.signature(PropertyFilter).parameters.items()}
+
+def search_statement(query: dict):
+    """The statement /property/search/ builds for a query string."""
+    query = dict(query)
+    sort = PropertySort(query.pop('sort', 'id'))
+    params = PageParams(20, query.pop('after', None))
+    filters = PropertyFilter(**{name: FILTER_TYPES[name](query[name]) if name in query else None
+                                for name in FILTER_TYPES})
+    return keyset(filters.apply(select(*EXPORT_COLUMNS)), sort.columns, params, sort.descending)
+
+@pytest.mark.parametrize('query, index, ordered', SHAPES, ids=SHAPE_IDS)
+def test_sqlite_search_plan(client, db_engine, db_path, query, index, ordered):
+    statements = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db_engine.sync_engine, 'before_cursor_execute', capture)
+    try:
+        response = client.get('/property/search/', params=query)
+    finally:
+        event.remove(db_engine.sync_engine, 'before_cursor_execute', capture)
+    assert response.status_code == 200, response.text
+    [(statement, parameters)] = statements
+    with sqlite3.connect(db_path) as connection:
+        plan = [row[-1] for row in connection.execute(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+    if index is None:
+        assert plan == ['SCAN property']
+    else:
+        assert any(f'USING INDEX {index} ' in f'{step} ' for step in plan), plan
+    if ordered:
+        assert 'USE TEMP B-TREE FOR ORDER BY' not in plan, plan
+
+@pytest.fixture(scope='module')
+def postgres_engine():
+    url = os.getenv('TEST_POSTGRES_URL')
+    if not url:
+        pytest.skip('TEST_POSTGRES_URL is not set')
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    yield engine
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+@pytest.mark.parametrize('query, index, ordered', SHAPES, ids=SHAPE_IDS)
+def test_postgres_search_plan(postgres_engine, query, index, ordered):
+    sql = search_statement(query).compile(postgres_engine, compile_kwargs={'literal_binds': True})
+    with postgres_engine.connect() as connection:
+        # An empty table is cheapest to scan; disabling that shows whether an index can serve the query.
+        connection.execute(text('SET enable_seqscan = off'))
+        plan = '\n'.join(row[0] for row in connection.execute(text(f'EXPLAIN {sql}')))
+    assert (index or 'property_pkey') in plan, plan
+    if ordered:
+        assert 'Sort' not in plan.replace('Sort Key', ''), plan
+
+def _create(client, **fields) -> int:
+    response = client.post('/property/', json={**PROPERTY, **fields})
+    assert response.status_code == 200, response.text
+    return response.json()['id']
+
+def _text_search(client, **params) -> dict:
+    response = client.get('/property/search/text/', params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_text_search_ranks_title_matches_first(client):
+    in_description = _create(client, title='Flat', description='Quiet garden behind the house.')
+    in_title = _create(client, title='Garden flat', description='Ground floor.')
+    twice = _create(client, title='Garden flat with garden view', description='Private garden.')
+    _create(client, title='Studio', description='City center.')
+    assert [item['id'] for item in _text_search(client, q='garden')['items']] == [twice, in_title, in_description]
+    assert _text_search(client, q='garden studio')['items'] == []
+
+@pytest.mark.anyio
+async def test_text_search_filters_by_city(client, sessions):
+    async with sessions() as db:
+        db.add(City(city_name='Osh'))
+        await db.commit()
+    bishkek = _create(client, title='Garden flat', city_id=1)
+    osh = _create(client, title='Garden flat', city_id=2)
+    assert [item['id'] for item in _text_search(client, q='garden', city_id=2)['items']] == [osh]
+    assert [item['id'] for item in _text_search(client, q='garden', city_id=1)['items']] == [bishkek]
+
+def test_text_search_pages_by_rank_then_id(client):
+    # Ties on rank are broken by id, so pages neither repeat nor skip listings.
+    ids = [_create(client, title='Garden flat') for _ in range(5)]
+    ids += [_create(client, title='Garden flat', description='Garden view.') for _ in range(2)]
+    seen, cursor = [], None
+    while True:
+        page = _text_search(client, q='garden', limit=3, **({'after': cursor} if cursor else {}))
+        seen += [item['id'] for item in page['items']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert seen == ids[5:][::-1] + ids[:5][::-1]
+
+def test_text_search_follows_updates_and_deletes(client):
+    property_id = _create(client, title='Garden flat')
+    assert client.put(f'/property/{property_id}/', json={**PROPERTY, 'title': 'Penthouse'}).status_code == 200
+    assert _text_search(client, q='garden')['items'] == []
+    assert [item['id'] for item in _text_search(client, q='penthouse')['items']] == [property_id]
+    assert client.delete(f'/property/{property_id}/').status_code == 200
+    assert _text_search(client, q='penthouse')['items'] == []
@@ -0,0 +1,44 @@
+from datetime import date
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from fast_house_kg.api import property, serialization, users
+from fast_house_kg.api.pagination import PageParams, paginate_rows
+from fast_house_kg.database.models import Property, UserProfile
+from fast_house_kg.database.schema import PageSchema, PropertyOutSchema, UserProfileOutSchema
+from tests.conftest import PROPERTY
+
+PAGES = [
+    (property.property_page_json, PageSchema[PropertyOutSchema], property.EXPORT_COLUMNS, Property.id),
+    (users.user_page_json, PageSchema[UserProfileOutSchema], users.USER_COLUMNS, UserProfile.id),
+]
+
+def _default_response(response_model, content) -> bytes:
+    """What FastAPI sends for the same content through response_model and its default JSONResponse."""
+    app = FastAPI()
+    app.get('/', response_model=response_model)(lambda: content)
+    return TestClient(app).get('/').content
+
+@pytest.mark.anyio
+@pytest.mark.parametrize('mode', ['validate', 'trusted'])
+@pytest.mark.parametrize('fast_json, response_model, columns, order', PAGES)
+async def test_fast_json_matches_the_default_response(sessions, monkeypatch, mode, fast_json, response_model,
+                                                      columns, order):
+    monkeypatch.setattr(serialization, 'SERIALIZATION_MODE', mode)
+    async with sessions() as db:
+        db.add_all([
+            # Optional columns left NULL next to ones that are set, non-ASCII text and every enum kind.
+            Property(**PROPERTY),
+            Property(**{**PROPERTY, 'title': 'Квартира в центре', 'property_type': 'house', 'region': 'Osh',
+                        'condition': 'Good', 'external_id': 'ext-1', 'estimated_price': 51234.5,
+                        'model_version': 'v2', 'created_date': date(2025, 12, 31)}),
+            UserProfile(username='buyer', email='buyer@example.com', password='x', status='Buyer',
+                        data_registered=date(2024, 2, 29)),
+        ])
+        await db.commit()
+        pages = [await paginate_rows(db, select(*columns), [order], PageParams(limit=limit, after=None))
+                 for limit in (1, 10)]
+    assert pages[0]['next_cursor'] is not None and pages[1]['next_cursor'] is None
+    for content in pages:
+        assert fast_json.render(content) == _default_response(response_model, content)
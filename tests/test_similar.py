@@ -0,0 +1,63 @@
+from collections import namedtuple
+import pytest
+from fast_house_kg.api.similar import SIMILAR_FEATURES, SimilarityIndex, similar_index
+from fast_house_kg.database.models import Property, RegionChoices
+from tests.conftest import PROPERTY
+from tests.test_bulk import _bulk
+
+pytest.importorskip('scipy')
+
+Row = namedtuple('Row', ('id', *SIMILAR_FEATURES))
+
+def _rows(count: int) -> list:
+    return [Row(i, 50000 + i * 100, 60 + i % 7, 1 + i % 4, 1 + i % 9, RegionChoices.bishkek, 1 + i % 3)
+            for i in range(1, count + 1)]
+
+def test_query_keeps_searching_past_tombstoned_neighbours():
+    index = SimilarityIndex()
+    rows = _rows(500)
+    index.build(rows)
+    query = rows[0][1:]
+    nearest = [property_id for property_id, _ in index.query(query, 200)]
+    # Far more tombstones than the first (k + 1) * CANDIDATES round returns, and no delta replacements.
+    index.tombstones.update(nearest[:150])
+    result = index.query(query, 5, exclude=rows[0].id)
+    assert len(result) == 5
+    assert not {property_id for property_id, _ in result} & index.tombstones
+
+def test_query_returns_what_is_left_when_everything_else_is_tombstoned():
+    index = SimilarityIndex()
+    rows = _rows(30)
+    index.build(rows)
+    index.tombstones.update(row.id for row in rows[2:])
+    assert {property_id for property_id, _ in index.query(rows[0][1:], 5)} == {1, 2}
+
+@pytest.mark.anyio
+async def test_rebuild_streams_every_row(sessions, monkeypatch):
+    monkeypatch.setattr('fast_house_kg.api.similar.SIMILAR_FETCH_CHUNK_SIZE', 3)
+    async with sessions() as db:
+        db.add_all([Property(**{**PROPERTY, 'price': 1000 * (i + 1)}) for i in range(10)])
+        await db.commit()
+    index = SimilarityIndex()
+    await index.rebuild()
+    assert sorted(index.ids.tolist()) == list(range(1, 11))
+
+@pytest.fixture
+def live_index():
+    """The app's index, built empty so requests' commits feed its delta; reset afterwards."""
+    similar_index.build([])
+    yield similar_index
+    similar_index.__init__()
+
+def test_bulk_loaded_and_upserted_rows_are_queryable(client, live_index):
+    rows = [{**PROPERTY, 'external_id': str(i), 'price': 40000 + i * 20000} for i in range(5)]
+    assert _bulk(client, rows, 'insert')['written'] == 5
+    assert sorted(live_index.delta) == [1, 2, 3, 4, 5]
+    similar = client.get('/property/1/similar/', params={'k': 3})
+    assert similar.status_code == 200, similar.text
+    assert [item['id'] for item in similar.json()] == [2, 3, 4]
+
+    # Upserting moves listing 5 next to listing 1.
+    assert _bulk(client, [{**rows[4], 'price': 41000}], 'upsert')['written'] == 1
+    assert live_index.delta[5][0] == 41000
+    assert client.get('/property/1/similar/', params={'k': 1}).json()[0]['id'] == 5
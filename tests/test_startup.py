@@ -0,0 +1,20 @@
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from fast_house_kg.api import media
+
+def test_importing_the_app_skips_auth_and_image_libraries():
+    code = 'import sys, main; assert not {"passlib", "jose", "PIL"} & set(sys.modules), sorted(sys.modules)'
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+def test_shutdown_stops_background_work_and_disposes_engines(app, db_engine, monkeypatch):
+    import main
+    disposed = []
+    event.listen(db_engine.sync_engine, 'engine_disposed', lambda engine: disposed.append(engine))
+    monkeypatch.setattr(main, 'engines', {'primary': db_engine})
+    monkeypatch.setattr(media, 'media_executor', ProcessPoolExecutor(1))
+    with TestClient(app) as client:
+        assert client.get('/city/').status_code == 200
+    assert disposed == [db_engine.sync_engine]
@@ -0,0 +1,27 @@
+import pytest
+from sqlalchemy import select, update
+from fast_house_kg.database.models import Property
+from tests.conftest import PROPERTY
+
+def test_updates_bump_the_etag_version(client):
+    property_id = client.post('/property/', json=PROPERTY).json()['id']
+    for version in (2, 3):
+        assert client.put(f'/property/{property_id}/', json={**PROPERTY, 'price': version}).status_code == 200
+        assert client.get(f'/property/{property_id}/').headers['etag'] == f'"{property_id}-{version}"'
+
+@pytest.mark.anyio
+async def test_concurrent_core_write_does_not_fail_orm_update(sessions):
+    async with sessions() as db:
+        db.add(Property(**PROPERTY))
+        await db.commit()
+    async with sessions() as reader, sessions() as writer:
+        property_db = await reader.scalar(select(Property))
+        # What the bulk upsert and re-valuation do between this session's read and its write.
+        await writer.execute(update(Property).values(version=Property.version + 1, estimated_price=1.0))
+        await writer.commit()
+        property_db.title = 'Edited'
+        await reader.commit()
+        await reader.refresh(property_db)
+        assert property_db.version == 3
+        await reader.delete(property_db)
+        await reader.commit()